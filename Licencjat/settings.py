@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -74,12 +77,59 @@ WSGI_APPLICATION = 'Licencjat.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Profil bazy wybierany zmiennymi środowiskowymi:
+#   METRIX_DB_ENGINE=sqlite (domyślnie) albo postgresql
+#   METRIX_DB_NAME, METRIX_DB_USER, METRIX_DB_PASSWORD, METRIX_DB_HOST, METRIX_DB_PORT
+#   METRIX_DB_POOL=1 – pula połączeń psycopg (wymaga psycopg[pool]), inaczej trwałe połączenia
+#   METRIX_DB_CONN_MAX_AGE – czas życia trwałego połączenia w sekundach
+#   METRIX_SQLITE_TUNING=0 – wyłącza WAL i pozostałe PRAGMA dla SQLite
+
+DB_ENGINE = os.environ.get('METRIX_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('METRIX_DB_POOL', '0') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('METRIX_DB_NAME', 'metrix'),
+            'USER': os.environ.get('METRIX_DB_USER', 'metrix'),
+            'PASSWORD': os.environ.get('METRIX_DB_PASSWORD', ''),
+            'HOST': os.environ.get('METRIX_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('METRIX_DB_PORT', '5432'),
+            # Pula połączeń i CONN_MAX_AGE wykluczają się w Django
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('METRIX_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': not DB_POOL,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('METRIX_DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('METRIX_DB_POOL_MAX', 20)),
+                },
+            } if DB_POOL else {},
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    SQLITE_TUNING = os.environ.get('METRIX_SQLITE_TUNING', '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('METRIX_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # BEGIN IMMEDIATE – piszący czekają na blokadę zamiast dostawać "database is locked" w trakcie transakcji
+                'transaction_mode': 'IMMEDIATE',
+                # Jedyne źródło czasu oczekiwania na blokadę (sekundy); PRAGMA busy_timeout by je nadpisało
+                'timeout': 20,
+            } if SQLITE_TUNING else {},
+        }
     }
-}
+else:
+    raise ImproperlyConfigured(f"METRIX_DB_ENGINE must be 'sqlite' or 'postgresql', not {DB_ENGINE!r}.")
+
+# PRAGMA ustawiane w metrix.signals przy każdym nowym połączeniu SQLite
+METRIX_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 134217728,
+} if DB_ENGINE == 'sqlite' and SQLITE_TUNING else {}
 
 
 # Password validation
@@ -115,3 +165,25 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Metrix analysis
+# Report maximal cliques of the mutual-choice graph with four or more members
+# next to the triangles listed as cliques.
+METRIX_MAXIMAL_CLIQUES = True
+
+# Seconds the rendered sociomatrices and structure lists of a completed research
+# stay in the cache (the key changes whenever the analysis is recomputed).
+METRIX_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Chains listed in a stored analysis (None lists all of them); the full count is
+# always stored and every chain can be browsed page by page.
+METRIX_CHAIN_LIMIT = 200
+
+# Questions of one research are analysed in a pool of this many worker processes
+# (threads would not help: the detectors hold the GIL); 1 analyses them one after
+# another. The pool is started once per process and reused by later analyses.
+METRIX_ANALYSIS_WORKERS = 1
+
+# With METRIX_BACKGROUND_ANALYSIS=1 missing analyses are queued as AnalysisJob rows
+# and computed by `python manage.py analysis_worker` instead of inside the request.
+METRIX_BACKGROUND_ANALYSIS = os.environ.get('METRIX_BACKGROUND_ANALYSIS', '0') == '1'
@@ -0,0 +1,146 @@
+"""
+Load test of the test-taking pages: async views under ASGI vs a thread-per-request WSGI server.
+
+Both runs fire the same GET requests for ConductTestView steps at a seeded
+research. The ASGI run keeps ``--concurrency`` requests in flight on one
+event loop, calling the ASGI application the way a server does; the WSGI
+run uses a fixed pool of ``--threads`` workers, like a sync server would.
+``--latency`` adds a sleep to every query, simulating a database behind a
+network round-trip, which is where the async views pay off.
+
+    python benchmarks/async_load.py --requests 400 --concurrency 64 --threads 8 --latency 0.005
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=64, help="Requests in flight in the ASGI run.")
+    parser.add_argument('--threads', type=int, default=8, help="Worker threads in the WSGI run.")
+    parser.add_argument('--latency', type=float, default=0.005, help="Seconds added to every query.")
+    parser.add_argument('--participants', type=int, default=30)
+    parser.add_argument('--questions', type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Licencjat.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from django.db import connection, connections
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+    from django.urls import reverse
+    from metrix.models import CustomUser, Participant, Question, Research, ResearchQuestion
+
+    settings.ALLOWED_HOSTS = ['*']
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(args.latency)
+        return execute(sql, params, many, context)
+
+    def add_latency(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.append(delay)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(Path(directory) / 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            owner = CustomUser.objects.create_user(email='bench@example.com', username='bench', password='bench')
+            research = Research.objects.create(
+                owner=owner, name='Load test', person_count=args.participants, question_count=args.questions,
+            )
+            Participant.objects.bulk_create([
+                Participant(research=research, name=f"P{i}", age=10, gender='other') for i in range(args.participants)
+            ])
+            questions = Question.objects.bulk_create([Question(text=f"Q{i}") for i in range(args.questions)])
+            ResearchQuestion.objects.bulk_create([
+                ResearchQuestion(research=research, question=question, choice_count=3) for question in questions
+            ])
+            urls = [
+                reverse('conduct-test', kwargs={'pk': research.pk, 'step': i % args.participants})
+                for i in range(args.requests)
+            ]
+            connections.close_all()
+            if args.latency:
+                connection_created.connect(add_latency)
+
+            def wsgi_get(url):
+                status = Client().get(url).status_code
+                connections.close_all()
+                return status
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.threads) as pool:
+                wsgi_statuses = list(pool.map(wsgi_get, urls))
+            wsgi_seconds = time.perf_counter() - start
+
+            application = get_asgi_application()
+
+            async def asgi_get(url):
+                # Surowe wywołanie ASGI, tak jak robi to serwer (uvicorn, daphne)
+                scope = {
+                    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                    'scheme': 'http', 'path': url, 'raw_path': url.encode(), 'query_string': b'', 'root_path': '',
+                    'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+                }
+                messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+                disconnected = asyncio.Event()
+                statuses = []
+
+                async def receive():
+                    if messages:
+                        return messages.pop()
+                    await disconnected.wait()
+                    return {'type': 'http.disconnect'}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        statuses.append(message['status'])
+
+                await application(scope, receive, send)
+                disconnected.set()
+                return statuses[0]
+
+            async def asgi_run():
+                limit = asyncio.Semaphore(args.concurrency)
+
+                async def get(url):
+                    async with limit:
+                        return await asgi_get(url)
+
+                return await asyncio.gather(*(get(url) for url in urls))
+
+            start = time.perf_counter()
+            asgi_statuses = asyncio.run(asgi_run())
+            asgi_seconds = time.perf_counter() - start
+            connections.close_all()
+        finally:
+            connection_created.disconnect(add_latency)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    for name, statuses, seconds in [
+        (f"WSGI, {args.threads} threads", wsgi_statuses, wsgi_seconds),
+        (f"ASGI, {args.concurrency} in flight", asgi_statuses, asgi_seconds),
+    ]:
+        failed = sum(status != 200 for status in statuses)
+        print(f"{name:24} {len(statuses) / seconds:8.1f} req/s   {len(statuses)} requests, {failed} failed "
+              f"in {seconds:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
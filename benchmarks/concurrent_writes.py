@@ -0,0 +1,124 @@
+"""
+Concurrent write benchmark for the database profiles in Licencjat/settings.py.
+
+Simulates a classroom submitting ConductTestView steps at the same time:
+every thread repeatedly replaces one participant's answers in a transaction
+(delete + bulk_create), the way the view does. On SQLite it runs once with the
+default journal (METRIX_SQLITE_TUNING=0) and once with WAL and the other
+PRAGMAs; with METRIX_DB_ENGINE=postgresql it measures the configured server.
+
+    python benchmarks/concurrent_writes.py --threads 16 --steps 40
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_profile(args):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Licencjat.settings')
+    import django
+    django.setup()
+
+    from django.db import OperationalError, connection, connections, transaction
+    from metrix.models import CustomUser, Participant, Question, Research, ResearchQuestion, Response
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(Path(directory) / 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            owner = CustomUser.objects.create_user(email='bench@example.com', username='bench', password='bench')
+            research = Research.objects.create(
+                owner=owner, name='Concurrent', person_count=args.participants, question_count=args.questions,
+            )
+            participants = [p.pk for p in Participant.objects.bulk_create([
+                Participant(research=research, name=f"P{i}", age=10, gender='other') for i in range(args.participants)
+            ])]
+            questions = Question.objects.bulk_create([Question(text=f"Q{i}") for i in range(args.questions)])
+            ResearchQuestion.objects.bulk_create([
+                ResearchQuestion(research=research, question=question, choice_count=3) for question in questions
+            ])
+            connection.close()
+
+            counts = {'writes': 0, 'errors': 0}
+            lock = threading.Lock()
+
+            def submit(worker):
+                rng = random.Random(worker)
+                for _ in range(args.steps):
+                    source = rng.choice(participants)
+                    targets = [pk for pk in participants if pk != source]
+                    try:
+                        with transaction.atomic():
+                            Response.objects.filter(research=research, source_id=source).delete()
+                            Response.objects.bulk_create([
+                                Response(research=research, question=question, source_id=source, target_id=target)
+                                for question in questions
+                                for target in rng.sample(targets, 3)
+                            ])
+                        key = 'writes'
+                    except OperationalError:
+                        key = 'errors'
+                    with lock:
+                        counts[key] += 1
+                connections.close_all()
+
+            threads = [threading.Thread(target=submit, args=(worker,)) for worker in range(args.threads)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(json.dumps({
+        'vendor': connection.vendor,
+        'writes': counts['writes'],
+        'errors': counts['errors'],
+        'seconds': round(elapsed, 3),
+        'steps_per_second': round(counts['writes'] / elapsed, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--steps', type=int, default=40, help="Submitted steps per thread.")
+    parser.add_argument('--participants', type=int, default=30)
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        return run_profile(args)
+
+    if os.environ.get('METRIX_DB_ENGINE', 'sqlite') == 'sqlite':
+        profiles = {'sqlite default': '0', 'sqlite tuned (WAL)': '1'}
+    else:
+        profiles = {os.environ['METRIX_DB_ENGINE']: os.environ.get('METRIX_SQLITE_TUNING', '1')}
+
+    for name, tuning in profiles.items():
+        result = subprocess.run(
+            [sys.executable, __file__, '--run'] + sys.argv[1:],
+            env={**os.environ, 'METRIX_SQLITE_TUNING': tuning},
+            capture_output=True, text=True, check=True,
+        )
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{name:22} {stats['steps_per_second']:8} steps/s   "
+              f"{stats['writes']} saved, {stats['errors']} failed in {stats['seconds']} s")
+
+
+if __name__ == '__main__':
+    main()
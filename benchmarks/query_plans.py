@@ -0,0 +1,116 @@
+"""
+Query-plan and latency benchmark for the Response indexes.
+
+Seeds a throw-away SQLite database with synthetic studies, then runs the
+queries behind ResearchDetailView and ConductTestView with and without the
+composite Response indexes (migration 0003) and prints their plans and median latency.
+
+    python benchmarks/query_plans.py --studies 50 --participants 40 --questions 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Licencjat.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from metrix.models import CustomUser, Participant, Question, Research, ResearchQuestion, Response  # noqa: E402
+
+
+def seed(studies, participants, questions, choices):
+    owner = CustomUser.objects.create_user(email='bench@example.com', username='bench', password='bench')
+    question_pool = Question.objects.bulk_create([Question(text=f"Question {i}") for i in range(questions)])
+    rng = random.Random(0)
+
+    for number in range(studies):
+        research = Research.objects.create(
+            owner=owner, name=f"Study {number}", person_count=participants,
+            question_count=questions, is_completed=True,
+        )
+        roster = Participant.objects.bulk_create([
+            Participant(research=research, name=f"P{i}", age=10, gender='other') for i in range(participants)
+        ])
+        ResearchQuestion.objects.bulk_create([
+            ResearchQuestion(research=research, question=question, choice_count=choices) for question in question_pool
+        ])
+        Response.objects.bulk_create([
+            Response(research=research, question=question, source=source, target=target)
+            for question in question_pool
+            for source in roster
+            for target in rng.sample([p for p in roster if p.pk != source.pk], choices)
+        ])
+    return research
+
+
+def measure(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset.all())
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run_paths(research, repeat):
+    source = Participant.objects.filter(research=research).order_by('pk').first()
+    question_ids = list(ResearchQuestion.objects.filter(research=research).values_list('question_id', flat=True))
+    paths = {
+        'detail: responses of research': (
+            Response.objects.filter(research=research).values_list('question_id', 'source_id', 'target_id')
+        ),
+        'conduct-test: answers of participant': (
+            Response.objects.filter(research=research, source=source, question_id__in=question_ids).values_list('id')
+        ),
+    }
+    return {name: (queryset.explain(), measure(queryset, repeat)) for name, queryset in paths.items()}
+
+
+def migrate_indexes(enabled):
+    # Cofnięcie do migracji sprzed 0003_response_indexes usuwa indeksy, dane zostają
+    target = [] if enabled else ['metrix', '0002_researchanalysis']
+    call_command('migrate', *target, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--studies', type=int, default=50)
+    parser.add_argument('--participants', type=int, default=40)
+    parser.add_argument('--questions', type=int, default=5)
+    parser.add_argument('--choices', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = str(Path(directory) / 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            research = seed(args.studies, args.participants, args.questions, args.choices)
+            print(f"Seeded {Response.objects.count()} responses in {args.studies} studies.\n")
+
+            migrate_indexes(False)
+            without = run_paths(research, args.repeat)
+            migrate_indexes(True)
+            with_indexes = run_paths(research, args.repeat)
+
+            for name in with_indexes:
+                print(f"== {name}")
+                print(f"   without indexes: {without[name][1]:8.3f} ms   {without[name][0]}")
+                print(f"   with indexes:    {with_indexes[name][1]:8.3f} ms   {with_indexes[name][0]}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
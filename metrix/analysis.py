@@ -0,0 +1,649 @@
+from collections import defaultdict
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from itertools import chain, islice
+from threading import Lock
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Participant, ParticipantDegree, Research, Response, ResearchAnalysis, ResearchQuestion
+
+# Podbij przy każdej zmianie formatu lub sposobu liczenia wyników analizy
+ANALYSIS_VERSION = 3
+
+
+def research_participants(research):
+    return Participant.objects.filter(research=research).order_by('pk')
+
+
+def research_questions(research):
+    return ResearchQuestion.objects.filter(research=research).select_related('question').order_by('pk')
+
+
+def fill_sociomatrices(participant_ids, question_ids, rows):
+    """
+    Returns {question_id: N×N boolean array} filled from (question_id, source_id, target_id) rows.
+
+    The rows are streamed into one integer array and mapped to matrix positions
+    with searchsorted, so the whole fill is a single vectorized assignment;
+    rows of unknown questions or participants are skipped.
+    """
+    question_ids = list(dict.fromkeys(question_ids))
+    size = len(participant_ids)
+    stack = np.zeros((len(question_ids), size, size), dtype=bool)
+
+    rows = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 3)
+    if len(rows) and stack.size:
+        questions = positions(question_ids, rows[:, 0])
+        sources = positions(participant_ids, rows[:, 1])
+        targets = positions(participant_ids, rows[:, 2])
+        known = (questions >= 0) & (sources >= 0) & (targets >= 0)
+        stack[questions[known], sources[known], targets[known]] = True
+
+    return {question_id: stack[k] for k, question_id in enumerate(question_ids)}
+
+
+def positions(ids, values):
+    """Index of every value in ``ids`` (-1 for values that are not there)."""
+    ids = np.asarray(ids, dtype=np.int64)
+    low, high = int(ids.min()), int(ids.max())
+    if high - low < 4 * len(ids) + 1024:
+        # Klucze badania są zwykle zwartym zakresem – wtedy wystarcza tablica przeglądowa
+        lookup = np.full(high - low + 1, -1, dtype=np.int64)
+        lookup[ids[::-1] - low] = np.arange(len(ids))[::-1]
+        inside = (values >= low) & (values <= high)
+        return np.where(inside, lookup[np.clip(values - low, 0, high - low)], -1)
+    order = np.argsort(ids, kind='stable')
+    found = order[np.minimum(np.searchsorted(ids, values, sorter=order), len(ids) - 1)]
+    return np.where(ids[found] == values, found, -1)
+
+
+def build_sociomatrices(research, participants, questions):
+    """
+    Returns {question_pk: N×N boolean array} for the given research.
+
+    Rows and columns follow the order of ``participants``; all Response rows
+    are streamed from a single query.
+    """
+    rows = Response.objects.filter(research=research).values_list('question_id', 'source_id', 'target_id')
+    return fill_sociomatrices([p.pk for p in participants], [rq.question_id for rq in questions], rows.iterator())
+
+
+def union_matrix(matrices, size):
+    union = np.zeros((size, size), dtype=bool)
+    for matrix in matrices:
+        union |= matrix
+    return union
+
+
+# Wszystkie funkcje poniżej operują na macierzy sąsiedztwa A (N×N, bool),
+# gdzie A[i, j] oznacza, że uczestnik i wskazał uczestnika j.
+# Wyniki są indeksami uczestników, a nie obiektami modeli.
+
+def mutual_matrix(adjacency):
+    return adjacency & adjacency.T
+
+
+def unreciprocated_matrix(adjacency):
+    return adjacency & ~adjacency.T
+
+
+def incoming_votes(adjacency):
+    return adjacency.sum(axis=0)
+
+
+def outgoing_votes(adjacency):
+    return adjacency.sum(axis=1)
+
+
+# Detektory struktur pracują na bitsetach: wiersz i (oraz kolumna j) to jedna liczba całkowita,
+# więc stopnie to popcount, a wzajemność to AND wiersza z kolumną.
+
+class BitAdjacency:
+    """Adjacency matrix stored as one Python int per row and per column (bit j of ``rows[i]`` means i chose j)."""
+
+    def __init__(self, adjacency):
+        self.size = len(adjacency)
+        self.rows = pack_rows(adjacency)
+        self.columns = pack_rows(adjacency.T)
+
+    def out_degree(self, i):
+        return self.rows[i].bit_count()
+
+    def in_degree(self, j):
+        return self.columns[j].bit_count()
+
+    def mutual(self, i):
+        return self.rows[i] & self.columns[i]
+
+    def unreciprocated(self, i):
+        return self.rows[i] & ~self.columns[i]
+
+
+def pack_rows(matrix):
+    packed = np.packbits(np.asarray(matrix, dtype=bool), axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+def bits(value):
+    """Indices of the set bits of ``value``, in ascending order."""
+    while value:
+        lowest = value & -value
+        yield lowest.bit_length() - 1
+        value ^= lowest
+
+
+def find_pairs(bitsets):
+    return [
+        (i, j)
+        for i in range(bitsets.size)
+        for j in bits(bitsets.mutual(i) >> (i + 1) << (i + 1))
+    ]
+
+
+# Łańcuchy a → b → c w grafie U = A & ~Aᵀ: ich liczba wynika ze stopni (Σ in_U(b)·out_U(b)),
+# a lista jest generowana leniwie, więc koszt zależy tylko od liczby faktycznie pokazanych łańcuchów
+
+def count_chains(bitsets):
+    return sum(
+        (bitsets.columns[b] & ~bitsets.rows[b]).bit_count() * bitsets.unreciprocated(b).bit_count()
+        for b in range(bitsets.size)
+    )
+
+
+def iter_chains(bitsets, starters=None):
+    """Yields every a → b → c where neither link is reciprocated, sorted by (a, b, c); only from ``starters`` if given."""
+    unreciprocated = [bitsets.unreciprocated(i) for i in range(bitsets.size)]
+    for a in range(bitsets.size) if starters is None else starters:
+        for b in bits(unreciprocated[a]):
+            for c in bits(unreciprocated[b]):
+                yield a, b, c
+
+
+def chain_starters(bitsets):
+    """Returns (a, number of chains starting at a) for every participant who starts at least one chain."""
+    out_degree = [bitsets.unreciprocated(b).bit_count() for b in range(bitsets.size)]
+    starters = []
+    for a in range(bitsets.size):
+        count = sum(out_degree[b] for b in bits(bitsets.unreciprocated(a)))
+        if count:
+            starters.append((a, count))
+    return starters
+
+
+def find_chains(bitsets, limit=None):
+    """The first ``limit`` chains (all of them when ``limit`` is None), sorted by (a, b, c)."""
+    return list(islice(iter_chains(bitsets), limit))
+
+
+def top_stars(incoming):
+    if not incoming.size or not incoming.max():
+        return []
+    return np.flatnonzero(incoming == incoming.max()).tolist()
+
+
+def find_top_stars(bitsets):
+    """Participants with the highest (non-zero) number of incoming votes."""
+    return top_stars(np.array([bitsets.in_degree(j) for j in range(bitsets.size)], dtype=int))
+
+
+def find_silent_stars(bitsets):
+    """Participants chosen by at least half the group who chose nobody themselves."""
+    threshold = bitsets.size // 2
+    return [
+        i for i in range(bitsets.size)
+        if bitsets.in_degree(i) >= threshold and not bitsets.rows[i]
+    ]
+
+
+def find_cliques(bitsets):
+    """
+    Returns every triangle of the mutual-choice graph as sorted (a, b, c).
+
+    Degree-ordered triangle listing: each mutual edge is oriented towards the
+    endpoint of higher (degree, index) rank, so every triangle is found exactly
+    once from its lowest-ranked vertex in O(E·√E).
+    """
+    neighbours = [bitsets.mutual(v) for v in range(bitsets.size)]
+    rank = [(adj.bit_count(), v) for v, adj in enumerate(neighbours)]
+    forward = [sum(1 << u for u in bits(adj) if rank[u] > rank[v]) for v, adj in enumerate(neighbours)]
+
+    cliques = []
+    for v, higher in enumerate(forward):
+        for u in bits(higher):
+            for w in bits(higher & forward[u]):
+                cliques.append(tuple(sorted((v, u, w))))
+    cliques.sort()
+    return cliques
+
+
+def find_maximal_cliques(bitsets, min_size=4):
+    """Maximal cliques of the mutual-choice graph with at least ``min_size`` members (Bron–Kerbosch with pivoting)."""
+    neighbours = [bitsets.mutual(v) for v in range(bitsets.size)]
+    cliques = []
+
+    def expand(clique, candidates, excluded):
+        if not candidates and not excluded:
+            if len(clique) >= min_size:
+                cliques.append(tuple(sorted(clique)))
+            return
+        if len(clique) + candidates.bit_count() < min_size:
+            return
+        pivot = max(bits(candidates | excluded), key=lambda v: (candidates & neighbours[v]).bit_count())
+        for v in bits(candidates & ~neighbours[pivot]):
+            expand(clique + [v], candidates & neighbours[v], excluded & neighbours[v])
+            candidates &= ~(1 << v)
+            excluded |= 1 << v
+
+    expand([], sum(1 << v for v, adj in enumerate(neighbours) if adj), 0)
+    cliques.sort()
+    return cliques
+
+
+def is_network(bitsets):
+    everyone = (1 << bitsets.size) - 1
+    return all(row | (1 << i) == everyone for i, row in enumerate(bitsets.rows))
+
+
+def group_metrics(adjacency, choice_count):
+    return degree_group_metrics(
+        incoming_votes(adjacency), outgoing_votes(adjacency), outgoing_votes(mutual_matrix(adjacency)), choice_count
+    )
+
+
+# Miary liczone z samych stopni uczestników (wektorów długości N) – z macierzy albo z tabeli ParticipantDegree
+
+def degree_group_metrics(incoming, outgoing, mutual, choice_count):
+    participant_count = len(incoming)
+    mutual_count = int(mutual.sum()) // 2
+    unreciprocated_count = int(outgoing.sum() - mutual.sum())
+
+    required_choices = choice_count or 1  # zabezpieczenie
+    max_mutual_possible = (required_choices * participant_count) / 2
+    cohesion = mutual_count / max_mutual_possible if max_mutual_possible else 0
+
+    factor = 1 - (required_choices / (participant_count - 1)) if participant_count > 1 else 0
+    denominator_density = unreciprocated_count * factor
+    numerator_density = mutual_count * factor
+
+    if denominator_density > 0:
+        density = numerator_density / denominator_density
+    elif numerator_density > 0:
+        density = float('inf')  # unreciprocated == 0, mutual > 0
+    else:
+        density = 0
+
+    return {
+        'cohesion': round(cohesion, 2),
+        'density': round(density, 2) if density != float('inf') else '∞',
+        'isolation': isolation_index(incoming),
+    }
+
+
+def isolation_index(incoming):
+    isolated = int((incoming == 0).sum())
+    isolation = (1 / isolated) if isolated > 0 else 0
+    return round(isolation, 2)
+
+
+def status_scores(incoming):
+    participant_count = len(incoming)
+    if participant_count <= 1:
+        return [0] * participant_count
+    status = incoming / (participant_count - 1)
+    return [round(score, 2) for score in status.tolist()]
+
+
+def individual_status(adjacency):
+    return status_scores(incoming_votes(adjacency))
+
+
+def analyse_relations(adjacency, find_stars=find_top_stars, maximal_cliques=False, chain_limit=None):
+    bitsets = BitAdjacency(adjacency)
+    relations = {
+        'pairs': find_pairs(bitsets),
+        'chains': find_chains(bitsets, chain_limit),
+        'chain_count': count_chains(bitsets),
+        'stars': find_stars(bitsets),
+        'cliques': find_cliques(bitsets),
+        'network': is_network(bitsets),
+    }
+    if maximal_cliques:
+        relations['maximal_cliques'] = find_maximal_cliques(bitsets)
+    return relations
+
+
+def analyse_research(research, participants, questions, matrices=None):
+    """
+    Full analysis of a research as plain, index-based data.
+
+    ``participants`` and ``questions`` fix the matrix order; every participant
+    reference in the result is a position in ``participants``. Sociomatrices
+    already built for them can be passed as ``matrices``.
+    """
+    participants = list(participants)
+    questions = list(questions)
+    if matrices is None:
+        matrices = build_sociomatrices(research, participants, questions)
+    return analyse_matrices(
+        [p.pk for p in participants],
+        [(rq.question_id, rq.choice_count) for rq in questions],
+        matrices,
+        maximal_cliques=getattr(settings, 'METRIX_MAXIMAL_CLIQUES', True),
+        chain_limit=getattr(settings, 'METRIX_CHAIN_LIMIT', None),
+        workers=getattr(settings, 'METRIX_ANALYSIS_WORKERS', 1),
+    )
+
+
+def analyse_question(job):
+    """Analysis of one question (``choice_count`` None: the union of all questions, with silent stars)."""
+    question_id, choice_count, adjacency, maximal_cliques, chain_limit = job
+    if choice_count is None:
+        return analyse_relations(
+            adjacency, find_stars=find_silent_stars, maximal_cliques=maximal_cliques, chain_limit=chain_limit
+        )
+    return {
+        'question': question_id,
+        'matrix': chosen_targets(adjacency),
+        'relations': analyse_relations(adjacency, maximal_cliques=maximal_cliques, chain_limit=chain_limit),
+        'group': group_metrics(adjacency, choice_count),
+        'individual': individual_status(adjacency),
+    }
+
+
+_process_pools = {}
+_process_pools_lock = Lock()
+
+
+def process_pool(workers):
+    """
+    A process pool of ``workers`` that lives as long as this process.
+
+    Starting worker processes (and django.setup in each) costs far more than
+    analysing a typical research, so the pool is created on first use and then
+    shared by every analysis of the process, e.g. the whole analysis_worker run.
+    """
+    with _process_pools_lock:
+        if workers not in _process_pools:
+            _process_pools[workers] = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        return _process_pools[workers]
+
+
+def run_jobs(function, jobs, workers=1):
+    """
+    Maps ``function`` over ``jobs`` in the process pool of ``workers``, keeping the order.
+
+    The detectors are pure Python and hold the GIL, so only processes run them
+    in parallel. Runs serially for a single worker or job, and falls back to the
+    serial loop when the pool cannot be started or breaks.
+    """
+    if workers > 1 and len(jobs) > 1:
+        try:
+            return list(process_pool(workers).map(function, jobs))
+        except (BrokenExecutor, OSError):
+            # Zepsutą pulę odrzucamy – następne wywołanie uruchomi nową
+            with _process_pools_lock:
+                _process_pools.pop(workers, None)
+    return [function(job) for job in jobs]
+
+
+def analyse_matrices(participant_ids, questions, matrices, maximal_cliques=True, chain_limit=None, workers=1):
+    """
+    Analysis of ready sociomatrices, without touching the database.
+
+    ``questions`` is a list of (question_id, choice_count) and ``matrices``
+    maps question ids to adjacency arrays ordered like ``participant_ids``.
+    Only the first ``chain_limit`` chains are listed; ``chain_count`` has them all.
+    Questions (and the union) are analysed independently, in parallel with
+    more than one worker process (see run_jobs).
+    """
+    jobs = [(None, None, union_matrix(matrices.values(), len(participant_ids)), maximal_cliques, chain_limit)]
+    jobs += [
+        (question_id, choice_count, matrices[question_id], maximal_cliques, chain_limit)
+        for question_id, choice_count in questions
+    ]
+    relations, *results = run_jobs(analyse_question, jobs, workers)
+    return {
+        'participants': list(participant_ids),
+        'relations': relations,
+        'questions': results,
+    }
+
+
+def chosen_targets(adjacency):
+    """Rows of ``adjacency`` as lists of chosen positions – the stored form of a sociomatrix."""
+    return [np.flatnonzero(row).tolist() for row in adjacency]
+
+
+def targets_adjacency(targets, size):
+    """N×N boolean array rebuilt from lists of chosen positions (see chosen_targets)."""
+    adjacency = np.zeros((size, size), dtype=bool)
+    sources = np.repeat(np.arange(len(targets)), [len(row) for row in targets])
+    adjacency[sources, np.fromiter(chain.from_iterable(targets), dtype=np.int64)] = True
+    return adjacency
+
+
+def stored_adjacency(analysis, question_id=None):
+    """Adjacency of one question (the union of all when ``question_id`` is None) rebuilt from analysis data."""
+    size = len(analysis['participants'])
+    return union_matrix(
+        (targets_adjacency(result['matrix'], size)
+         for result in analysis['questions'] if question_id is None or result['question'] == question_id),
+        size,
+    )
+
+
+def hydrate_relations(relations, participants):
+    """Replaces participant indices in ``relations`` with the matching objects."""
+    return {
+        'pairs': [tuple(participants[i] for i in pair) for pair in relations['pairs']],
+        'chains': [tuple(participants[i] for i in chain) for chain in relations['chains']],
+        'chain_count': relations['chain_count'],
+        'stars': [participants[i] for i in relations['stars']],
+        'cliques': [tuple(participants[i] for i in clique) for clique in relations['cliques']],
+        'maximal_cliques': [
+            [participants[i] for i in clique] for clique in relations.get('maximal_cliques', [])
+        ],
+        'network': relations['network'],
+    }
+
+
+def store_analysis(research, participants=None, questions=None):
+    """
+    Computes the analysis of a completed research and saves it as its ResearchAnalysis.
+
+    The responses are read under the research lock, and the ParticipantDegree
+    rows are brought in line with them on the way (see locked_sociomatrices).
+    """
+    participants = list(research_participants(research) if participants is None else participants)
+    questions = list(research_questions(research) if questions is None else questions)
+    matrices, response_count = locked_sociomatrices(research, participants, questions)
+    data = analyse_research(research, participants, questions, matrices)
+    save_analysis(research, response_count, data)
+    return data
+
+
+def locked_sociomatrices(research, participants, questions):
+    """(sociomatrices, response count) of ``research`` read under its lock, with ParticipantDegree synced to them."""
+    with transaction.atomic():
+        lock_research(research)
+        matrices = build_sociomatrices(research, participants, questions)
+        response_count = Response.objects.filter(research=research).count()
+        sync_degrees(research, [p.pk for p in participants], matrices)
+    return matrices, response_count
+
+
+def save_analysis(research, response_count, data):
+    """Saves ``data``, computed from sociomatrices with ``response_count`` responses, as the ResearchAnalysis."""
+    ResearchAnalysis.objects.update_or_create(
+        research=research,
+        defaults={
+            'version': ANALYSIS_VERSION,
+            'response_count': response_count,
+            'data': data,
+        },
+    )
+
+
+def cached_analysis(research, participants, questions):
+    """
+    Returns the analysis of ``research``, reusing the stored one when it is still valid.
+
+    Only completed research is stored; the entry is keyed by the analysis
+    version and the response count and must describe the same participants
+    and questions.
+    """
+    if not research.is_completed:
+        return analyse_research(research, participants, questions)
+
+    data = stored_analysis(research, participants, questions)
+    if data is not None:
+        return data
+    return store_analysis(research, participants, questions)
+
+
+def stored_analysis(research, participants, questions):
+    """The stored analysis of ``research`` if it is still valid (see cached_analysis), otherwise None."""
+    cached = ResearchAnalysis.objects.filter(
+        research=research,
+        version=ANALYSIS_VERSION,
+        response_count=Response.objects.filter(research=research).count(),
+    ).first()
+    if (cached is not None
+            and cached.data['participants'] == [p.pk for p in participants]
+            and [q['question'] for q in cached.data['questions']] == [rq.question_id for rq in questions]):
+        return cached.data
+    return None
+
+
+def analysis_stamp(research):
+    """Version of the stored analysis (its update time), or None when nothing is stored."""
+    updated_at = ResearchAnalysis.objects.filter(research=research).values_list('updated_at', flat=True).first()
+    return updated_at and f"{ANALYSIS_VERSION}-{updated_at.timestamp()}"
+
+
+def invalidate_analysis(research_id):
+    ResearchAnalysis.objects.filter(research_id=research_id).delete()
+
+
+# Tabela ParticipantDegree: stopnie uczestników aktualizowane przy każdym zapisanym kroku testu.
+# Brak wiersza oznacza same zera. Każdy zapis odpowiedzi i stopni badania bierze najpierw
+# blokadę jego wiersza (lock_research), więc równoległe kroki nie gubią zmian.
+
+def lock_research(research):
+    """Locks the row of ``research`` until the end of the current transaction (a plain read on SQLite)."""
+    Research.objects.select_for_update().filter(pk=research.pk).values_list('pk').first()
+
+
+def matrix_degrees(adjacency):
+    """3×N array of (in-degree, out-degree, mutual count) rows, the layout of degree_lookup."""
+    return np.stack([incoming_votes(adjacency), outgoing_votes(adjacency), outgoing_votes(mutual_matrix(adjacency))])
+
+
+def store_degrees(research, participant_ids, matrices):
+    """Rewrites the ParticipantDegree rows of ``research`` for the questions in ``matrices``."""
+    rows = []
+    for question_id, adjacency in matrices.items():
+        incoming, outgoing, mutual = matrix_degrees(adjacency).tolist()
+        rows.extend(
+            ParticipantDegree(
+                research=research, question_id=question_id, participant_id=pk,
+                in_degree=incoming[i], out_degree=outgoing[i], mutual_count=mutual[i],
+            )
+            for i, pk in enumerate(participant_ids)
+            if incoming[i] or outgoing[i]
+        )
+    with transaction.atomic():
+        ParticipantDegree.objects.filter(research=research, question_id__in=list(matrices)).delete()
+        ParticipantDegree.objects.bulk_create(rows, batch_size=1000)
+
+
+def sync_degrees(research, participant_ids, matrices):
+    """
+    Rewrites the ParticipantDegree rows of the questions whose stored degrees differ from ``matrices``.
+
+    Catches responses written past update_degrees (e.g. directly through the
+    ORM); when the table agrees with the matrices this is a single read.
+    """
+    stored = degree_lookup(research, participant_ids, list(matrices))
+    stale = {
+        question_id: adjacency for question_id, adjacency in matrices.items()
+        if not np.array_equal(stored[question_id], matrix_degrees(adjacency))
+    }
+    if stale:
+        store_degrees(research, participant_ids, stale)
+
+
+def update_degrees(research, source_id, targets):
+    """
+    Applies one participant's new answers to the ParticipantDegree rows.
+
+    ``targets`` maps question ids to the set of chosen participant ids. It must
+    run in the transaction that replaces the Response rows of ``source_id``,
+    after lock_research and before the old rows are deleted.
+    """
+    question_ids = list(targets)
+    previous = defaultdict(set)
+    for question_id, target_id in (Response.objects.filter(research=research, source_id=source_id,
+                                                           question_id__in=question_ids)
+                                   .values_list('question_id', 'target_id')):
+        previous[question_id].add(target_id)
+    choosers = defaultdict(set)
+    for question_id, chooser_id in (Response.objects.filter(research=research, target_id=source_id,
+                                                            question_id__in=question_ids)
+                                    .values_list('question_id', 'source_id')):
+        choosers[question_id].add(chooser_id)
+
+    # (pytanie, uczestnik) -> zmiana [in, out, mutual]
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for question_id, chosen in targets.items():
+        before, returned = previous[question_id], choosers[question_id]
+        deltas[question_id, source_id][1] += len(chosen) - len(before)
+        deltas[question_id, source_id][2] += len(chosen & returned) - len(before & returned)
+        for target_id, change in [(t, -1) for t in before - chosen] + [(t, 1) for t in chosen - before]:
+            deltas[question_id, target_id][0] += change
+            if target_id in returned:
+                deltas[question_id, target_id][2] += change
+
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    existing = {
+        (row.question_id, row.participant_id): row
+        for row in ParticipantDegree.objects.filter(
+            research=research,
+            question_id__in={question_id for question_id, _ in deltas},
+            participant_id__in={participant_id for _, participant_id in deltas},
+        )
+    }
+    changed, created = [], []
+    for (question_id, participant_id), (in_change, out_change, mutual_change) in deltas.items():
+        row = existing.get((question_id, participant_id))
+        if row is None:
+            row = ParticipantDegree(research=research, question_id=question_id, participant_id=participant_id)
+            created.append(row)
+        else:
+            changed.append(row)
+        row.in_degree += in_change
+        row.out_degree += out_change
+        row.mutual_count += mutual_change
+    ParticipantDegree.objects.bulk_update(changed, ['in_degree', 'out_degree', 'mutual_count'])
+    ParticipantDegree.objects.bulk_create(created)
+
+
+def degree_lookup(research, participant_ids, question_ids):
+    """
+    Returns {question_id: 3×N array} of (in-degree, out-degree, mutual count) rows read from ParticipantDegree.
+
+    Columns follow the order of ``participant_ids``; a single query, no matrices.
+    """
+    index = {pk: i for i, pk in enumerate(participant_ids)}
+    degrees = {question_id: np.zeros((3, len(index)), dtype=int) for question_id in question_ids}
+    for question_id, participant_id, *values in (ParticipantDegree.objects.filter(research=research)
+                                                 .values_list('question_id', 'participant_id', 'in_degree',
+                                                              'out_degree', 'mutual_count')):
+        if question_id in degrees and participant_id in index:
+            degrees[question_id][:, index[participant_id]] = values
+    return degrees
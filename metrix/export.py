@@ -0,0 +1,139 @@
+import csv
+import json
+import tempfile
+
+from .analysis import degree_group_metrics, degree_lookup, research_participants, research_questions, status_scores
+from .jobs import research_analysis
+from .models import Response, ResearchQuestion
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX jest opcjonalny – bez openpyxl dostępne są tylko CSV i JSON Lines
+    Workbook = None
+
+
+# Każdy zbiór danych to funkcja zwracająca (nagłówek, iterator wierszy)
+
+def edge_rows(research):
+    header = ['question_id', 'question', 'source_id', 'source', 'target_id', 'target']
+    rows = (
+        Response.objects.filter(research=research)
+        .order_by('pk')
+        .values_list('question_id', 'question__text', 'source_id', 'source__name', 'target_id', 'target__name')
+        .iterator()
+    )
+    return header, rows
+
+
+def matrix_rows(research):
+    """One row per (question, source) with a 0/1 column per target participant, in participant pk order."""
+    participants = list(research_participants(research).values_list('pk', 'name'))
+    index = {pk: i for i, (pk, _) in enumerate(participants)}
+    question_ids = list(
+        ResearchQuestion.objects.filter(research=research).order_by('question_id').values_list('question_id', flat=True)
+    )
+    header = ['question_id', 'source_id', 'source'] + [str(pk) for pk, _ in participants]
+
+    def rows():
+        # Odpowiedzi posortowane tak samo jak wiersze macierzy – scalamy je w jednym przebiegu
+        responses = (
+            Response.objects.filter(research=research)
+            .order_by('question_id', 'source_id')
+            .values_list('question_id', 'source_id', 'target_id')
+            .iterator()
+        )
+        pending = next(responses, None)
+        for question_id in question_ids:
+            for source_id, name in participants:
+                row = [0] * len(participants)
+                while pending is not None and pending[:2] < (question_id, source_id):
+                    pending = next(responses, None)
+                while pending is not None and pending[:2] == (question_id, source_id):
+                    if pending[2] in index:
+                        row[index[pending[2]]] = 1
+                    pending = next(responses, None)
+                yield [question_id, source_id, name] + row
+
+    return header, rows()
+
+
+def _metrics(research):
+    """(participants, questions, {question_id: (group metrics, individual statuses)}) of ``research``."""
+    participants = list(research_participants(research))
+    questions = list(research_questions(research))
+    analysis = research_analysis(research, participants, questions)[0] if research.is_completed else None
+    if analysis is not None:
+        # Zakończone badanie eksportujemy z zapisanej analizy – te same wartości co na stronie badania
+        metrics = {result['question']: (result['group'], result['individual']) for result in analysis['questions']}
+    else:
+        # W trakcie badania (albo gdy analiza czeka w kolejce) – odczyt z tabeli ParticipantDegree, bez macierzy
+        degrees = degree_lookup(research, [p.pk for p in participants], [rq.question_id for rq in questions])
+        metrics = {
+            rq.question_id: (
+                degree_group_metrics(*degrees[rq.question_id], rq.choice_count),
+                status_scores(degrees[rq.question_id][0]),
+            )
+            for rq in questions
+        }
+    return participants, questions, metrics
+
+
+def group_metric_rows(research):
+    header = ['question_id', 'question', 'cohesion', 'density', 'isolation']
+    _, questions, metrics = _metrics(research)
+
+    def rows():
+        for rq in questions:
+            group, _ = metrics[rq.question_id]
+            yield [rq.question_id, rq.question.text, group['cohesion'], group['density'], group['isolation']]
+
+    return header, rows()
+
+
+def individual_metric_rows(research):
+    header = ['question_id', 'participant_id', 'participant', 'status']
+    participants, questions, metrics = _metrics(research)
+    rows = (
+        [rq.question_id, participant.pk, participant.name, status]
+        for rq in questions
+        for participant, status in zip(participants, metrics[rq.question_id][1])
+    )
+    return header, rows
+
+
+DATASETS = {
+    'edges': edge_rows,
+    'matrix': matrix_rows,
+    'group': group_metric_rows,
+    'individual': individual_metric_rows,
+}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), ensure_ascii=False) + '\n'
+
+
+def write_xlsx(header, rows, title):
+    """Writes the rows to a temporary XLSX file (write-only mode keeps memory flat) and returns it rewound."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -99,13 +99,17 @@ class ResearchQuestionForm(forms.Form):
 
 
 class ConductTestForm(forms.Form):
-    def __init__(self, *args, participant=None, questions=None, choices_queryset=None, **kwargs):
+    def __init__(self, *args, participant=None, questions=None, roster=None, **kwargs):
         super().__init__(*args, **kwargs)
+        # roster to lista (pk, nazwa) wczytana raz i współdzielona przez wszystkie pytania;
+        # cleaned_data zawiera listy pk wybranych uczestników
+        choices = [(pk, name) for pk, name in roster if pk != participant.pk]
         for question in questions:
             field_name = f"question_{question.id}"
-            self.fields[field_name] = forms.ModelMultipleChoiceField(
+            self.fields[field_name] = forms.TypedMultipleChoiceField(
                 label=question.question.text,
-                queryset=choices_queryset.exclude(pk=participant.pk),  # <- tu zmiana
+                choices=choices,
+                coerce=int,
                 widget=forms.CheckboxSelectMultiple,
                 required=True
             )
@@ -120,3 +124,54 @@ class ConductTestForm(forms.Form):
                 if len(selected) > field.max_choices:
                     self.add_error(name, f"You can select up to {field.max_choices} options.")
         return cleaned_data
+
+
+class ParticipantFilterForm(forms.Form):
+    research = forms.ModelChoiceField(
+        queryset=Research.objects.none(), required=False, empty_label="All researches",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    name = forms.CharField(max_length=100, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    gender = forms.ChoiceField(
+        choices=[('', 'Any gender')] + Participant._meta.get_field('gender').choices, required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+    def __init__(self, *args, owner=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['research'].queryset = Research.objects.filter(owner=owner).order_by('-created_at')
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+        if self.cleaned_data['research']:
+            queryset = queryset.filter(research=self.cleaned_data['research'])
+        if self.cleaned_data['name']:
+            queryset = queryset.filter(name__icontains=self.cleaned_data['name'])
+        if self.cleaned_data['gender']:
+            queryset = queryset.filter(gender=self.cleaned_data['gender'])
+        return queryset
+
+
+class ResearchImportForm(forms.Form):
+    name = forms.CharField(max_length=255)
+    participants_file = forms.FileField(help_text="CSV with the columns name, age, gender and description.")
+    choices_file = forms.FileField(
+        required=False,
+        help_text="Optional CSV with the columns source, question and targets (names separated by ';')."
+    )
+    questions = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'rows': 3}),
+        help_text="Without a choices file: one question per line, the test is then conducted in the app."
+    )
+    choice_count = forms.IntegerField(min_value=1, initial=3, help_text="Maximum choices per question.")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        has_questions = bool(cleaned_data.get('questions', '').strip())
+        if cleaned_data.get('choices_file') and has_questions:
+            raise forms.ValidationError("Give either a choices file or questions, not both.")
+        if not cleaned_data.get('choices_file') and not has_questions:
+            raise forms.ValidationError("Give a choices file or at least one question.")
+        return cleaned_data
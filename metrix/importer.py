@@ -0,0 +1,214 @@
+import csv
+
+from django.db import transaction
+
+from .analysis import build_sociomatrices, store_degrees
+from .jobs import refresh_analysis
+from .models import Participant, Question, Research, ResearchQuestion, Response
+
+GENDERS = {value for value, _ in Participant._meta.get_field('gender').choices}
+MAX_ERRORS = 20
+MAX_AGE = 150
+
+
+class CSVImportError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class _Errors(list):
+    def add(self, message):
+        self.append(message)
+        if len(self) >= MAX_ERRORS:
+            raise CSVImportError(self)
+
+
+def _csv_rows(lines, label, columns):
+    """
+    Yields (line, row) of a CSV that must have ``columns``.
+
+    A missing column or malformed CSV (csv.Error – e.g. an overlong field)
+    stops the import with a CSVImportError.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        missing = set(columns) - set(reader.fieldnames or [])
+        if missing:
+            raise CSVImportError([f"{label} file is missing columns: {', '.join(sorted(missing))}."])
+        yield from enumerate(reader, start=2)
+    except csv.Error as error:
+        raise CSVImportError([f"{label} file is not valid CSV: {error}."])
+
+
+def read_age(value):
+    """The age as an int, or None unless it is a whole number from 0 to MAX_AGE."""
+    if not value.isdecimal() or len(value) > len(str(MAX_AGE)) or int(value) > MAX_AGE:
+        return None
+    return int(value)
+
+
+def read_participants(lines):
+    """
+    Reads a participants CSV with the columns name, age, gender and (optional) description.
+
+    Names identify participants in the choices CSV, so they must be unique.
+    """
+    errors = _Errors()
+    participants = []
+    seen = set()
+    for line, row in _csv_rows(lines, "Participants", ['name', 'age', 'gender']):
+        name = (row['name'] or '').strip()
+        age = read_age((row['age'] or '').strip())
+        gender = (row['gender'] or '').strip().lower()
+        if not name or len(name) > 100:
+            errors.add(f"Participants line {line}: name must have 1-100 characters.")
+        elif name in seen:
+            errors.add(f"Participants line {line}: duplicate name '{name}'.")
+        if age is None:
+            errors.add(f"Participants line {line}: age must be a whole number from 0 to {MAX_AGE}.")
+        if gender not in GENDERS:
+            errors.add(f"Participants line {line}: gender must be one of {', '.join(sorted(GENDERS))}.")
+        seen.add(name)
+        participants.append({
+            'name': name,
+            'age': age or 0,
+            'gender': gender,
+            'description': (row.get('description') or '').strip(),
+        })
+
+    if not participants:
+        errors.append("Participants file has no rows.")
+    if errors:
+        raise CSVImportError(errors)
+    return participants
+
+
+def read_choices(lines, names, choice_count):
+    """
+    Reads a choices CSV with the columns source, question and targets (names separated by ';').
+
+    Returns the question texts in order of appearance and (source, question, target) triples;
+    every row is validated against ``choice_count`` as it is read.
+    """
+    errors = _Errors()
+    questions = {}
+    choices = []
+    answered = set()
+    for line, row in _csv_rows(lines, "Choices", ['source', 'question', 'targets']):
+        source = (row['source'] or '').strip()
+        question = (row['question'] or '').strip()
+        targets = [target.strip() for target in (row['targets'] or '').split(';') if target.strip()]
+
+        if source not in names:
+            errors.add(f"Choices line {line}: unknown participant '{source}'.")
+            continue
+        if not question or len(question) > 255:
+            errors.add(f"Choices line {line}: question must have 1-255 characters.")
+            continue
+        if (source, question) in answered:
+            errors.add(f"Choices line {line}: '{source}' already answered this question.")
+            continue
+        if len(targets) > choice_count:
+            errors.add(f"Choices line {line}: {len(targets)} choices, at most {choice_count} allowed.")
+        if len(set(targets)) != len(targets):
+            errors.add(f"Choices line {line}: a participant is chosen twice.")
+        for target in targets:
+            if target not in names:
+                errors.add(f"Choices line {line}: unknown participant '{target}'.")
+            elif target == source:
+                errors.add(f"Choices line {line}: '{source}' cannot choose themselves.")
+
+        answered.add((source, question))
+        questions.setdefault(question, None)
+        choices.extend((source, question, target) for target in targets)
+
+    if errors:
+        raise CSVImportError(errors)
+    return list(questions), choices
+
+
+def read_questions(lines):
+    """Reads question texts, one per line, for research imported without a choices file; blank lines are skipped."""
+    errors = _Errors()
+    questions = []
+    for line, text in enumerate(lines, start=1):
+        text = text.strip()
+        if not text:
+            continue
+        if len(text) > 255:
+            errors.add(f"Questions line {line}: question must have 1-255 characters.")
+        elif text in questions:
+            errors.add(f"Questions line {line}: duplicate question '{text}'.")
+        else:
+            questions.append(text)
+
+    if not questions and not errors:
+        errors.append("Give at least one question or a choices file.")
+    if errors:
+        raise CSVImportError(errors)
+    return questions
+
+
+def import_research(owner, name, participant_lines, choice_lines=None, choice_count=1, question_lines=None):
+    """
+    Creates a research with its participants, questions and (optionally) responses from CSV lines.
+
+    Questions come from the choices file or, without one, from
+    ``question_lines`` (one text per line) – the test is then conducted in
+    the app. Everything is validated before the first write and saved in one
+    transaction; research imported with choices is marked as completed.
+    """
+    if choice_lines is not None and question_lines is not None:
+        raise CSVImportError(["Give either a choices file or questions, not both."])
+    participants_data = read_participants(participant_lines)
+    if choice_count > len(participants_data) - 1:
+        raise CSVImportError([f"Choice count cannot exceed {len(participants_data) - 1} for this roster."])
+
+    choices = []
+    if choice_lines is not None:
+        question_texts, choices = read_choices(choice_lines, {p['name'] for p in participants_data}, choice_count)
+        if not question_texts:
+            raise CSVImportError(["Choices file has no rows."])
+    else:
+        question_texts = read_questions(question_lines or [])
+
+    with transaction.atomic():
+        # Pytania z banku dopasowujemy po treści, brakujące tworzymy
+        questions = {}
+        for question in Question.objects.filter(text__in=question_texts).order_by('pk'):
+            questions.setdefault(question.text, question)
+        created = Question.objects.bulk_create([Question(text=text) for text in question_texts if text not in questions])
+        questions.update((question.text, question) for question in created)
+
+        research = Research.objects.create(
+            owner=owner,
+            name=name,
+            person_count=len(participants_data),
+            question_count=len(question_texts),
+            is_completed=choice_lines is not None,
+        )
+        participants = Participant.objects.bulk_create([
+            Participant(research=research, **data) for data in participants_data
+        ])
+        research_questions = ResearchQuestion.objects.bulk_create([
+            ResearchQuestion(research=research, question=questions[text], choice_count=choice_count)
+            for text in question_texts
+        ])
+
+        by_name = {participant.name: participant.pk for participant in participants}
+        Response.objects.bulk_create([
+            Response(
+                research=research,
+                question=questions[question],
+                source_id=by_name[source],
+                target_id=by_name[target]
+            )
+            for source, question, target in choices
+        ], batch_size=1000)
+        store_degrees(research, [p.pk for p in participants],
+                      build_sociomatrices(research, participants, research_questions))
+
+    if research.is_completed:
+        refresh_analysis(research)
+    return research
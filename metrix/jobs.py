@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .analysis import cached_analysis, store_analysis, stored_analysis
+from .models import AnalysisJob
+
+
+def background_analysis():
+    return getattr(settings, 'METRIX_BACKGROUND_ANALYSIS', False)
+
+
+def enqueue_analysis(research):
+    """Queues the analysis of ``research``, reusing a job that is still waiting for a worker."""
+    job = AnalysisJob.objects.filter(research=research, status=AnalysisJob.PENDING).order_by('pk').first()
+    return job or AnalysisJob.objects.create(research=research)
+
+
+def refresh_analysis(research):
+    """Stores the analysis of a completed research now, or queues it when analyses run in the background."""
+    if background_analysis():
+        enqueue_analysis(research)
+    else:
+        store_analysis(research)
+
+
+def research_analysis(research, participants, questions):
+    """
+    Returns (analysis, job) of a completed research for a request.
+
+    In background mode a missing analysis is never computed in the request:
+    it is queued and (None, job) is returned. Otherwise it is stored now if needed.
+    """
+    if background_analysis():
+        analysis = stored_analysis(research, participants, questions)
+        return analysis, (enqueue_analysis(research) if analysis is None else None)
+    return cached_analysis(research, participants, questions), None
+
+
+def latest_job(research):
+    return AnalysisJob.objects.filter(research=research).order_by('-pk').first()
+
+
+def claim_job():
+    """
+    Marks the oldest pending job as running and returns it (None when the queue is empty).
+
+    The conditional UPDATE makes the claim safe with several workers on any
+    database: a job taken by another worker in the meantime is skipped.
+    """
+    for job in AnalysisJob.objects.filter(status=AnalysisJob.PENDING).order_by('created_at', 'pk')[:10]:
+        started_at = timezone.now()
+        claimed = AnalysisJob.objects.filter(pk=job.pk, status=AnalysisJob.PENDING).update(
+            status=AnalysisJob.RUNNING, started_at=started_at
+        )
+        if claimed:
+            job.status, job.started_at = AnalysisJob.RUNNING, started_at
+            return job
+    return None
+
+
+def run_job(job):
+    try:
+        store_analysis(job.research)
+    except Exception as error:  # zadanie oznaczamy jako nieudane, worker działa dalej
+        job.status, job.error = AnalysisJob.FAILED, f"{type(error).__name__}: {error}"
+    else:
+        job.status = AnalysisJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs(seconds):
+    """Returns jobs left running for longer than ``seconds`` (e.g. by a killed worker) to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=seconds)
+    return AnalysisJob.objects.filter(status=AnalysisJob.RUNNING, started_at__lt=cutoff).update(
+        status=AnalysisJob.PENDING, started_at=None
+    )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from metrix.jobs import claim_job, requeue_stale_jobs, run_job
+from metrix.models import AnalysisJob
+
+
+class Command(BaseCommand):
+    help = "Runs queued research analyses (AnalysisJob rows) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds between polls of an empty queue.")
+        parser.add_argument(
+            '--requeue-after', type=int, default=600,
+            help="Seconds after which a running job is considered abandoned and queued again.",
+        )
+
+    def handle(self, *args, **options):
+        if options['sleep'] <= 0 or options['requeue_after'] <= 0:
+            raise CommandError("--sleep and --requeue-after must be positive.")
+
+        done = 0
+        try:
+            while True:
+                close_old_connections()
+                requeue_stale_jobs(options['requeue_after'])
+                job = claim_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                job = run_job(job)
+                done += 1
+                if job.status == AnalysisJob.FAILED:
+                    self.stderr.write(self.style.ERROR(f"Job {job.pk} failed: {job.error}"))
+                else:
+                    self.stdout.write(f"Analysed research {job.research_id} (job {job.pk}).")
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {done} analysis jobs."))
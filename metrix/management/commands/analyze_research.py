@@ -0,0 +1,118 @@
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from metrix.analysis import analyse_matrices, fill_sociomatrices, locked_sociomatrices, research_participants, \
+    research_questions, save_analysis
+from metrix.models import Participant, Research, ResearchQuestion, Response
+
+
+def analyse_job(job):
+    """Analysis of one research from its Response rows or (table format) its ready sociomatrices."""
+    research_id, participant_ids, questions, rows, matrices, maximal_cliques, chain_limit = job
+    if matrices is None:
+        matrices = fill_sociomatrices(participant_ids, [question_id for question_id, _ in questions], rows)
+    return research_id, analyse_matrices(
+        participant_ids, questions, matrices, maximal_cliques=maximal_cliques, chain_limit=chain_limit
+    )
+
+
+class Command(BaseCommand):
+    help = "Computes the analysis of every completed research, in batches, across a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (default: all cores).")
+        parser.add_argument('--batch-size', type=int, default=50, help="Research loaded from the database at once.")
+        parser.add_argument(
+            '--format', choices=['jsonl', 'table'], default='jsonl',
+            help="jsonl writes one research per line, table stores the results as ResearchAnalysis rows.",
+        )
+        parser.add_argument('--output', help="Output file for jsonl (default: standard output).")
+        parser.add_argument('--research', type=int, nargs='*', help="Only these research ids.")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError("--workers and --batch-size must be positive.")
+
+        research_ids = Research.objects.filter(is_completed=True).order_by('pk')
+        if options['research']:
+            research_ids = research_ids.filter(pk__in=options['research'])
+        research_ids = list(research_ids.values_list('pk', flat=True))
+
+        output = self.stdout
+        if options['format'] == 'jsonl' and options['output']:
+            output = open(options['output'], 'w')
+
+        done = 0
+        try:
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+                for start in range(0, len(research_ids), options['batch_size']):
+                    batch = research_ids[start:start + options['batch_size']]
+                    if options['format'] == 'table':
+                        jobs, stored = self.load_table_batch(batch)
+                    else:
+                        jobs, stored = self.load_batch(batch), None
+                    for research_id, analysis in executor.map(analyse_job, jobs):
+                        if stored is None:
+                            output.write(json.dumps({'research_id': research_id, 'analysis': analysis},
+                                                    ensure_ascii=False) + '\n')
+                        else:
+                            research, response_count = stored[research_id]
+                            save_analysis(research, response_count, analysis)
+                        done += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(f"Analysed {done} research."))
+
+    def load_batch(self, research_ids):
+        # Trzy zapytania na partię – uczestnicy, pytania i odpowiedzi wszystkich badań naraz
+        participants = defaultdict(list)
+        for research_id, pk in (Participant.objects.filter(research_id__in=research_ids)
+                                .order_by('research_id', 'pk').values_list('research_id', 'pk')):
+            participants[research_id].append(pk)
+
+        questions = defaultdict(list)
+        for research_id, question_id, choice_count in (ResearchQuestion.objects.filter(research_id__in=research_ids)
+                                                       .order_by('research_id', 'pk')
+                                                       .values_list('research_id', 'question_id', 'choice_count')):
+            questions[research_id].append((question_id, choice_count))
+
+        rows = defaultdict(list)
+        for research_id, *row in (Response.objects.filter(research_id__in=research_ids)
+                                  .values_list('research_id', 'question_id', 'source_id', 'target_id').iterator()):
+            rows[research_id].append(tuple(row))
+
+        return [
+            (research_id, participants[research_id], questions[research_id], rows[research_id], None,
+             *self.analysis_settings())
+            for research_id in research_ids
+        ]
+
+    def load_table_batch(self, research_ids):
+        """
+        Jobs of a batch whose results are stored, and {research_id: (research, response count)}.
+
+        Responses are read like in store_analysis – under the research lock,
+        syncing ParticipantDegree – so the stored analysis matches the table.
+        """
+        jobs, stored = [], {}
+        for research in Research.objects.filter(pk__in=research_ids).order_by('pk'):
+            participants = list(research_participants(research))
+            questions = list(research_questions(research))
+            matrices, response_count = locked_sociomatrices(research, participants, questions)
+            stored[research.pk] = research, response_count
+            jobs.append((
+                research.pk, [p.pk for p in participants], [(rq.question_id, rq.choice_count) for rq in questions],
+                None, matrices, *self.analysis_settings(),
+            ))
+        return jobs, stored
+
+    def analysis_settings(self):
+        return getattr(settings, 'METRIX_MAXIMAL_CLIQUES', True), getattr(settings, 'METRIX_CHAIN_LIMIT', None)
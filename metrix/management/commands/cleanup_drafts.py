@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from metrix.models import ResearchDraft
+
+
+class Command(BaseCommand):
+    help = "Deletes research creation drafts that have not been touched for a number of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Age in days after which a draft is stale.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError("--days cannot be negative.")
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        _, deleted = ResearchDraft.objects.filter(updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted.get(ResearchDraft._meta.label, 0)} stale drafts."))
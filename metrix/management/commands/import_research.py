@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from metrix.importer import CSVImportError, import_research
+
+
+class Command(BaseCommand):
+    help = "Imports a research with its participants and (optionally) recorded choices from CSV files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('owner', help="Email of the research owner.")
+        parser.add_argument('name', help="Name of the new research.")
+        parser.add_argument('participants', help="CSV with the columns name, age, gender and description.")
+        parser.add_argument('--choices', help="CSV with the columns source, question and targets (separated by ';').")
+        parser.add_argument(
+            '--question', action='append', dest='questions',
+            help="Question text for research imported without --choices (repeat for more questions).",
+        )
+        parser.add_argument('--choice-count', type=int, default=3, help="Maximum choices per question.")
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(email=options['owner'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['owner']}.")
+        if options['choice_count'] < 1:
+            raise CommandError("--choice-count must be positive.")
+
+        choices = None
+        try:
+            with open(options['participants'], newline='', encoding='utf-8-sig') as participants:
+                if options['choices']:
+                    choices = open(options['choices'], newline='', encoding='utf-8-sig')
+                research = import_research(
+                    owner, options['name'], participants, choices, options['choice_count'],
+                    question_lines=options['questions'],
+                )
+        except CSVImportError as error:
+            raise CommandError("\n".join(error.errors))
+        except OSError as error:
+            raise CommandError(str(error))
+        finally:
+            if choices is not None:
+                choices.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported research {research.pk} with {research.person_count} participants "
+            f"and {research.question_count} questions."
+        ))
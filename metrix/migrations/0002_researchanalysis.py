@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrix', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResearchAnalysis',
+            fields=[
+                ('research', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analysis', serialize=False, to='metrix.research')),
+                ('version', models.PositiveIntegerField()),
+                ('response_count', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
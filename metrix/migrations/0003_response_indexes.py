@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_responses(apps, schema_editor):
+    Response = apps.get_model('metrix', 'Response')
+    keep = (
+        Response.objects.values('research', 'question', 'source', 'target')
+        .annotate(keep_id=Min('id'))
+        .values('keep_id')
+    )
+    Response.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrix', '0002_researchanalysis'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_responses, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['research', 'source', 'question'], name='response_research_source_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='response',
+            constraint=models.UniqueConstraint(fields=('research', 'question', 'source', 'target'), name='unique_response'),
+        ),
+    ]
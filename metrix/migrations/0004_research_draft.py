@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrix', '0003_response_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResearchDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('person_count', models.PositiveIntegerField()),
+                ('question_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DraftQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('choice_count', models.PositiveIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='metrix.question')),
+                ('draft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='metrix.researchdraft')),
+            ],
+            options={
+                'ordering': ['position'],
+                'unique_together': {('draft', 'position')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DraftParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('age', models.PositiveIntegerField()),
+                ('gender', models.CharField(choices=[('male', 'Male'), ('female', 'Female'), ('other', 'Other')], max_length=10)),
+                ('description', models.TextField(blank=True)),
+                ('draft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='metrix.researchdraft')),
+            ],
+            options={
+                'ordering': ['position'],
+                'unique_together': {('draft', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:19
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_degrees(apps, schema_editor):
+    Response = apps.get_model('metrix', 'Response')
+    ParticipantDegree = apps.get_model('metrix', 'ParticipantDegree')
+    edges = set(Response.objects.values_list('research_id', 'question_id', 'source_id', 'target_id').iterator())
+    in_degree, out_degree, mutual_count = Counter(), Counter(), Counter()
+    for research_id, question_id, source_id, target_id in edges:
+        out_degree[research_id, question_id, source_id] += 1
+        in_degree[research_id, question_id, target_id] += 1
+        if (research_id, question_id, target_id, source_id) in edges:
+            mutual_count[research_id, question_id, source_id] += 1
+
+    ParticipantDegree.objects.bulk_create([
+        ParticipantDegree(
+            research_id=key[0], question_id=key[1], participant_id=key[2],
+            in_degree=in_degree[key], out_degree=out_degree[key], mutual_count=mutual_count[key],
+        )
+        for key in in_degree.keys() | out_degree.keys()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrix', '0004_research_draft'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantDegree',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('in_degree', models.PositiveIntegerField(default=0)),
+                ('out_degree', models.PositiveIntegerField(default=0)),
+                ('mutual_count', models.PositiveIntegerField(default=0)),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='degrees', to='metrix.participant')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='metrix.question')),
+                ('research', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='degrees', to='metrix.research')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('research', 'question', 'participant'), name='unique_participant_degree')],
+            },
+        ),
+        migrations.RunPython(fill_degrees, migrations.RunPython.noop),
+    ]
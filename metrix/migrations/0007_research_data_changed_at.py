@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_updated_at(apps, schema_editor):
+    Research = apps.get_model('metrix', 'Research')
+    Research.objects.update(data_changed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrix', '0006_analysis_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='research',
+            name='data_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_updated_at, migrations.RunPython.noop),
+    ]
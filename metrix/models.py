@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxLengthValidator
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 # Create your models here.
 class CustomUser(AbstractUser):
@@ -31,6 +32,8 @@ class Research(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_completed = models.BooleanField(default=False)
+    # Ostatnia zmiana odpowiedzi, uczestników lub pytań badania – Last-Modified i ETag w research_api
+    data_changed_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.name} (Owner: {self.owner})"
@@ -49,12 +52,15 @@ class ResearchQuestion(models.Model):
         return f"Q: {self.question.text} | R: {self.research.name} | Min choices: {self.choice_count}"
 
 
+GENDER_CHOICES = [('male', 'Male'), ('female', 'Female'), ('other', 'Other')]
+
+
 class Participant(models.Model):
     research = models.ForeignKey(Research, on_delete=models.CASCADE)
     participant_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
     age = models.PositiveIntegerField()
-    gender = models.CharField(max_length=10, choices=[('male', 'Male'), ('female', 'Female'), ('other', 'Other')])
+    gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
     description = models.TextField(blank=True)
 
     def __str__(self):
@@ -66,5 +72,142 @@ class Response(models.Model):
     source = models.ForeignKey('Participant', on_delete=models.CASCADE, related_name='responses_given')
     target = models.ForeignKey('Participant', on_delete=models.CASCADE, related_name='responses_received')
 
+    class Meta:
+        constraints = [
+            # Jeden głos na parę uczestników w danym pytaniu; indeks obsługuje też analizę badania
+            models.UniqueConstraint(fields=['research', 'question', 'source', 'target'], name='unique_response'),
+        ]
+        indexes = [
+            # Zapis i nadpisywanie odpowiedzi jednego uczestnika w ConductTestView
+            models.Index(fields=['research', 'source', 'question'], name='response_research_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} → {self.target} ({self.question})"
+
+class ResearchAnalysis(models.Model):
+    research = models.OneToOneField('Research', on_delete=models.CASCADE, primary_key=True, related_name='analysis')
+    version = models.PositiveIntegerField()
+    response_count = models.PositiveIntegerField()
+    data = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Analysis of {self.research.name} (v{self.version}, {self.response_count} responses)"
+
+
+class ParticipantDegree(models.Model):
+    """Votes received, given and returned by one participant in one question, kept current as answers are saved."""
+    research = models.ForeignKey('Research', on_delete=models.CASCADE, related_name='degrees')
+    question = models.ForeignKey('Question', on_delete=models.CASCADE)
+    participant = models.ForeignKey('Participant', on_delete=models.CASCADE, related_name='degrees')
+    in_degree = models.PositiveIntegerField(default=0)
+    out_degree = models.PositiveIntegerField(default=0)
+    mutual_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['research', 'question', 'participant'], name='unique_participant_degree'),
+        ]
+
+    def __str__(self):
+        return f"{self.participant} in {self.question}: {self.in_degree} in, {self.out_degree} out"
+
+
+class AnalysisJob(models.Model):
+    """A queued computation of a research analysis, run by the analysis_worker command."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    research = models.ForeignKey('Research', on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Worker pobiera najstarsze oczekujące zadanie, widok – ostatnie zadanie badania
+            models.Index(fields=['status', 'created_at'], name='analysisjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Analysis of {self.research_id} ({self.status})"
+
+
+class ResearchDraft(models.Model):
+    """A research being built in the creation wizard; the session only keeps its id."""
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    person_count = models.PositiveIntegerField()
+    question_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Draft {self.name} (Owner: {self.owner})"
+
+    def sync_rows(self, model, rows):
+        """
+        Makes the draft's ``model`` rows equal to ``rows`` (a list of field dicts, by position).
+
+        Only rows whose values differ are written; surplus positions are deleted.
+        """
+        existing = {row.position: row for row in model.objects.filter(draft=self)}
+        fields = sorted({field for data in rows for field in data})
+        to_create, to_update = [], []
+
+        for position, data in enumerate(rows):
+            row = existing.pop(position, None)
+            if row is None:
+                to_create.append(model(draft=self, position=position, **data))
+            elif any(getattr(row, field) != value for field, value in data.items()):
+                for field, value in data.items():
+                    setattr(row, field, value)
+                to_update.append(row)
+
+        if existing:
+            model.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+        model.objects.bulk_create(to_create)
+        if to_update:
+            model.objects.bulk_update(to_update, fields)
+        ResearchDraft.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+
+
+class DraftParticipant(models.Model):
+    draft = models.ForeignKey(ResearchDraft, on_delete=models.CASCADE, related_name='participants')
+    position = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    age = models.PositiveIntegerField()
+    gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
+    description = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('draft', 'position')
+        ordering = ['position']
+
+    def __str__(self):
+        return f"{self.name} (Draft: {self.draft.name})"
+
+
+class DraftQuestion(models.Model):
+    draft = models.ForeignKey(ResearchDraft, on_delete=models.CASCADE, related_name='questions')
+    position = models.PositiveIntegerField()
+    question = models.ForeignKey('Question', on_delete=models.CASCADE)
+    choice_count = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('draft', 'position')
+        ordering = ['position']
+
     def __str__(self):
-        return f"{self.source} → {self.target} ({self.question})"
\ No newline at end of file
+        return f"Q: {self.question.text} | Draft: {self.draft.name} | Min choices: {self.choice_count}"
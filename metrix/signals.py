@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .analysis import invalidate_analysis
+from .models import Participant, Research, Response, ResearchQuestion
+
+
+# Usunięcia wykrywa cached_analysis (liczba odpowiedzi, lista uczestników i pytań),
+# więc nie podpinamy post_delete – to wyłączyłoby szybkie kasowanie kaskadowe.
+@receiver(post_save, sender=Participant)
+@receiver(post_save, sender=ResearchQuestion)
+@receiver(post_save, sender=Response)
+def invalidate_research_analysis(sender, instance, **kwargs):
+    invalidate_analysis(instance.research_id)
+
+
+# Zmiana uczestnika lub pytania zmienia dane badania – data_changed_at to Last-Modified (i część ETag) w research_api.
+# Treść pytań z banku sprawdza ETag, więc edycja pytania nie przepisuje wszystkich badań, które go używają.
+@receiver(post_save, sender=Participant)
+@receiver(post_save, sender=ResearchQuestion)
+def touch_research(sender, instance, **kwargs):
+    Research.objects.filter(pk=instance.research_id).update(data_changed_at=timezone.now())
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'METRIX_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
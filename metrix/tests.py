@@ -1,3 +1,615 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import time
+import tracemalloc
+from itertools import combinations
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .analysis import BitAdjacency, analyse_matrices, build_sociomatrices, chain_starters, count_chains, degree_lookup, \
+    find_chains, find_cliques, find_maximal_cliques, incoming_votes, iter_chains, matrix_degrees, mutual_matrix, \
+    outgoing_votes, process_pool, research_participants, research_questions, store_analysis, store_degrees, targets_adjacency
+from .importer import CSVImportError, import_research
+from .models import AnalysisJob, CustomUser, DraftParticipant, DraftQuestion, Participant, ParticipantDegree, Question, \
+    Research, ResearchAnalysis, ResearchDraft, ResearchQuestion, Response
+from .views import ConductTestView
+
+
+# Rozmiary badań (uczestnicy, pytania) używane w benchmarkach widoków
+BENCHMARK_SIZES = [(10, 1), (50, 5), (200, 10)]
+CHOICE_COUNT = 3
+
+# Maksymalna liczba zapytań na żądanie – nie może zależeć od rozmiaru badania
+QUERY_BUDGETS = {
+    'research-detail': 21,  # zapis analizy: blokada badania i porównanie tabeli stopni w osobnej transakcji
+    'research-detail-cached': 9,
+    'research-detail-client': 9,
+    'conduct-test-get': 6,
+    'conduct-test-post': 15,
+    'research-confirm': 17,  # SQLite dzieli duże bulk_create na partie (limit parametrów zapytania)
+    'question-list': 4,
+}
+
+
+def seed_research(owner, rng, participant_count, question_count, completed=True, degrees=True):
+    research = Research.objects.create(
+        owner=owner,
+        name=f"Benchmark {participant_count}x{question_count}",
+        person_count=participant_count,
+        question_count=question_count,
+        is_completed=completed,
+    )
+    participants = Participant.objects.bulk_create([
+        Participant(research=research, name=f"Participant {i}", age=12, gender='other')
+        for i in range(participant_count)
+    ])
+    questions = Question.objects.bulk_create([Question(text=f"Question {i}") for i in range(question_count)])
+    research_question_list = ResearchQuestion.objects.bulk_create([
+        ResearchQuestion(research=research, question=question, choice_count=CHOICE_COUNT)
+        for question in questions
+    ])
+    if completed:
+        Response.objects.bulk_create([
+            Response(research=research, question=question, source=source, target=target)
+            for question in questions
+            for source in participants
+            for target in rng.sample([p for p in participants if p.pk != source.pk], CHOICE_COUNT)
+        ])
+        if degrees:
+            # Tak jak import CSV – odpowiedzi zapisane z pominięciem kroków testu wraz z tabelą stopni
+            store_degrees(research, [p.pk for p in participants],
+                          build_sociomatrices(research, participants, research_question_list))
+    return research
+
+
+class ViewBenchmarkTests(TestCase):
+    """
+    Query-count, wall-time and peak-memory benchmarks of the metrix views.
+
+    Every measurement is written to the JSON report named by the
+    METRIX_BENCHMARK_REPORT environment variable (benchmark_report.json by
+    default); a view exceeding its query budget fails the test.
+    """
+    results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        path = os.environ.get('METRIX_BENCHMARK_REPORT', settings.BASE_DIR / 'benchmark_report.json')
+        with open(path, 'w') as report:
+            json.dump({'budgets': QUERY_BUDGETS, 'results': cls.results}, report, indent=2)
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='bench@example.com', username='bench', password='bench')
+        self.client.force_login(self.user)
+        self.rng = random.Random(0)
+
+    def seed_research(self, participant_count, question_count, completed=True):
+        return seed_research(self.user, self.rng, participant_count, question_count, completed)
+
+    def measure(self, view, size, request):
+        tracemalloc.start()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        participant_count, question_count = size
+        self.results.append({
+            'view': view,
+            'participants': participant_count,
+            'questions': question_count,
+            'status': response.status_code,
+            'queries': len(queries),
+            'seconds': round(elapsed, 4),
+            'peak_memory_bytes': peak,
+        })
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[view],
+            f"{view} ran {len(queries)} queries for {participant_count} participants and {question_count} questions",
+        )
+        return response
+
+    def test_research_detail(self):
+        for size in BENCHMARK_SIZES:
+            with self.subTest(size=size):
+                research = self.seed_research(*size)
+                url = reverse('research-detail', kwargs={'research_id': research.pk})
+                self.measure('research-detail', size, lambda: self.client.get(url))
+                self.measure('research-detail-cached', size, lambda: self.client.get(url))
+                response = self.measure('research-detail-client', size, lambda: self.client.get(url, {'matrix': 'client'}))
+                self.assertEqual(len(response.context['matrices'][0]['targets']), size[0])
+
+    def test_conduct_test_step(self):
+        for size in BENCHMARK_SIZES:
+            with self.subTest(size=size):
+                research = self.seed_research(*size, completed=False)
+                url = reverse('conduct-test', kwargs={'pk': research.pk, 'step': 0})
+                response = self.measure('conduct-test-get', size, lambda: self.client.get(url))
+
+                data = {
+                    name: [choice for choice, _ in field.choices[:CHOICE_COUNT]]
+                    for name, field in response.context['form'].fields.items()
+                }
+                response = self.measure('conduct-test-post', size, lambda: self.client.post(url, data))
+                self.assertEqual(response.status_code, 302)
+
+    def test_question_list(self):
+        for size in BENCHMARK_SIZES:
+            with self.subTest(size=size):
+                # Każdy rozmiar dokłada pytania do banku; tylko bieżąca strona sprawdza, czy pytanie jest używane
+                self.seed_research(*size, completed=False)
+                response = self.measure('question-list', size, lambda: self.client.get(reverse('question_list')))
+                self.assertTrue(all(hasattr(question, 'is_used') for question in response.context['questions']))
+
+    def test_research_confirm(self):
+        for participant_count, question_count in BENCHMARK_SIZES:
+            with self.subTest(size=(participant_count, question_count)):
+                questions = Question.objects.bulk_create([Question(text=f"Question {i}") for i in range(question_count)])
+                name = f"Confirmed {participant_count}x{question_count}"
+                draft = ResearchDraft.objects.create(
+                    owner=self.user, name=name, person_count=participant_count, question_count=question_count,
+                )
+                DraftParticipant.objects.bulk_create([
+                    DraftParticipant(draft=draft, position=i, name=f"Participant {i}", age=12, gender='other')
+                    for i in range(participant_count)
+                ])
+                DraftQuestion.objects.bulk_create([
+                    DraftQuestion(draft=draft, position=i, question=question, choice_count=CHOICE_COUNT)
+                    for i, question in enumerate(questions)
+                ])
+                session = self.client.session
+                session['research_draft'] = draft.pk
+                session.save()
+
+                self.measure(
+                    'research-confirm', (participant_count, question_count),
+                    lambda: self.client.post(reverse('research-confirm')),
+                )
+                self.assertEqual(Participant.objects.filter(research__name=name).count(), participant_count)
+
+
+class ParticipantDegreeTests(TestCase):
+    """The incrementally updated ParticipantDegree rows must match degrees computed from the responses."""
+
+    def test_conduct_steps_update_degrees(self):
+        user = CustomUser.objects.create_user(email='degrees@example.com', username='degrees', password='degrees')
+        research = Research.objects.create(owner=user, name="Degrees", person_count=8, question_count=2)
+        Participant.objects.bulk_create([
+            Participant(research=research, name=f"Participant {i}", age=12, gender='other') for i in range(8)
+        ])
+        questions = Question.objects.bulk_create([Question(text=f"Question {i}") for i in range(2)])
+        ResearchQuestion.objects.bulk_create([
+            ResearchQuestion(research=research, question=question, choice_count=CHOICE_COUNT) for question in questions
+        ])
+        rng = random.Random(1)
+
+        # Kroki 0-6 (bez ostatniego, który przelicza tabelę od nowa), część wysłana ponownie
+        for step in [0, 1, 2, 3, 1, 4, 5, 6, 3, 0]:
+            url = reverse('conduct-test', kwargs={'pk': research.pk, 'step': step})
+            form = self.client.get(url).context['form']
+            data = {
+                name: rng.sample([choice for choice, _ in field.choices], rng.randint(1, CHOICE_COUNT))
+                for name, field in form.fields.items()
+            }
+            self.assertEqual(self.client.post(url, data).status_code, 302)
+
+        participants = list(research_participants(research))
+        research_question_list = list(research_questions(research))
+        matrices = build_sociomatrices(research, participants, research_question_list)
+        degrees = degree_lookup(research, [p.pk for p in participants], list(matrices))
+        for question_id, adjacency in matrices.items():
+            incoming, outgoing, mutual = degrees[question_id]
+            self.assertEqual(incoming.tolist(), incoming_votes(adjacency).tolist())
+            self.assertEqual(outgoing.tolist(), outgoing_votes(adjacency).tolist())
+            self.assertEqual(mutual.tolist(), outgoing_votes(mutual_matrix(adjacency)).tolist())
+
+
+class ParticipantListTests(TestCase):
+    def test_cursor_pages(self):
+        user = CustomUser.objects.create_user(email='list@example.com', username='list', password='list')
+        self.client.force_login(user)
+        research = seed_research(user, random.Random(0), 5, 1, completed=False)
+        pks = list(Participant.objects.filter(research=research).order_by('pk').values_list('pk', flat=True))
+        url = reverse('participant-manage-list')
+
+        with mock.patch('metrix.views.PARTICIPANTS_PER_PAGE', 2):
+            response = self.client.get(url, {'before': pks[3]})
+            self.assertEqual([p.pk for p in response.context['participants']], pks[1:3])
+            self.assertEqual(response.context['next_cursor'], pks[2])
+            self.assertEqual(response.context['previous_cursor'], pks[1])
+
+            # Cofnięcie spoza ostatniej strony – nowszych wierszy nie ma
+            response = self.client.get(url, {'before': pks[-1] + 100})
+            self.assertEqual([p.pk for p in response.context['participants']], pks[3:])
+            self.assertIsNone(response.context['next_cursor'])
+
+
+class DegreeRepairTests(TestCase):
+    """Responses written past update_degrees must not leak into exports or the participant page."""
+
+    def test_exports_and_degrees_follow_responses(self):
+        user = CustomUser.objects.create_user(email='repair@example.com', username='repair', password='repair')
+        self.client.force_login(user)
+        research = seed_research(user, random.Random(2), 15, 3, degrees=False)
+        participants = list(research_participants(research))
+        questions = list(research_questions(research))
+        matrices = build_sociomatrices(research, participants, questions)
+        analysis = analyse_matrices(
+            [p.pk for p in participants], [(rq.question_id, rq.choice_count) for rq in questions], matrices
+        )
+
+        response = self.client.get(reverse('research-export', args=[research.pk, 'group', 'jsonl']))
+        group = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(
+            [{key: row[key] for key in ['cohesion', 'density', 'isolation']} for row in group],
+            [result['group'] for result in analysis['questions']],
+        )
+        response = self.client.get(reverse('research-export', args=[research.pk, 'individual', 'jsonl']))
+        statuses = [json.loads(line)['status'] for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(statuses, [status for result in analysis['questions'] for status in result['individual']])
+
+        # Zapis analizy (tu: przy eksporcie) wyrównał też tabelę stopni, z której czyta strona uczestnika
+        degrees = degree_lookup(research, [p.pk for p in participants], list(matrices))
+        for question_id, adjacency in matrices.items():
+            self.assertEqual(degrees[question_id].tolist(), matrix_degrees(adjacency).tolist())
+        response = self.client.get(reverse('participant-detail', args=[participants[0].pk]))
+        self.assertEqual(
+            [row['status'] for row in response.context['question_degrees']],
+            [result['individual'][0] for result in analysis['questions']],
+        )
+
+
+class StructureDetectorTests(TestCase):
+    def mutual_graph(self, size, cliques):
+        adjacency = np.zeros((size, size), dtype=bool)
+        for clique in cliques:
+            for a, b in combinations(clique, 2):
+                adjacency[a, b] = adjacency[b, a] = True
+        return adjacency
+
+    def test_cliques_match_triple_scan(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            size = int(rng.integers(1, 25))
+            adjacency = rng.random((size, size)) < rng.uniform(0.05, 0.8)
+            np.fill_diagonal(adjacency, False)
+            # Dawna implementacja: każda trójka uczestników sprawdzana przez combinations()
+            mutual = mutual_matrix(adjacency)
+            expected = [
+                (a, b, c) for a, b, c in combinations(range(size), 3)
+                if mutual[a, b] and mutual[a, c] and mutual[b, c]
+            ]
+            self.assertEqual(find_cliques(BitAdjacency(adjacency)), expected)
+
+    def test_maximal_cliques(self):
+        adjacency = self.mutual_graph(11, [(0, 1, 2, 3, 4), (4, 5, 6, 7), (7, 8, 9)])
+        adjacency[0, 5] = adjacency[1, 5] = adjacency[2, 5] = adjacency[3, 5] = True  # wybory bez wzajemności
+        bitsets = BitAdjacency(adjacency)
+        self.assertEqual(find_maximal_cliques(bitsets), [(0, 1, 2, 3, 4), (4, 5, 6, 7)])
+        self.assertEqual(find_maximal_cliques(bitsets, min_size=3), [(0, 1, 2, 3, 4), (4, 5, 6, 7), (7, 8, 9)])
+        self.assertEqual(find_maximal_cliques(BitAdjacency(np.zeros((4, 4), dtype=bool))), [])
+
+    def test_chain_count_and_starters(self):
+        rng = np.random.default_rng(1)
+        for _ in range(100):
+            size = int(rng.integers(1, 30))
+            adjacency = rng.random((size, size)) < rng.uniform(0.05, 0.6)
+            np.fill_diagonal(adjacency, False)
+            bitsets = BitAdjacency(adjacency)
+            chains = list(iter_chains(bitsets))
+
+            self.assertEqual(count_chains(bitsets), len(chains))
+            self.assertEqual(chains, sorted(chains))
+            starters = chain_starters(bitsets)
+            self.assertEqual(sum(count for _, count in starters), len(chains))
+            for a, count in starters:
+                self.assertEqual(len(list(iter_chains(bitsets, starters=[a]))), count)
+
+    @override_settings(METRIX_CHAIN_LIMIT=5)
+    def test_chain_limit(self):
+        user = CustomUser.objects.create_user(email='chains@example.com', username='chains', password='chains')
+        research = seed_research(user, random.Random(3), 20, 2)
+        store_analysis(research)
+        matrices = build_sociomatrices(research, research_participants(research), research_questions(research))
+
+        for result in ResearchAnalysis.objects.get(research=research).data['questions']:
+            chains = find_chains(BitAdjacency(matrices[result['question']]))
+            self.assertGreater(len(chains), 5)
+            self.assertEqual(result['relations']['chain_count'], len(chains))
+            self.assertEqual([tuple(chain) for chain in result['relations']['chains']], chains[:5])
+
+
+class AnalysisRunnerTests(TestCase):
+    def test_parallel_analysis_matches_serial(self):
+        rng = np.random.default_rng(0)
+        participant_ids = list(range(1, 31))
+        questions = [(question_id, CHOICE_COUNT) for question_id in range(1, 6)]
+        matrices = {}
+        for question_id, _ in questions:
+            adjacency = rng.random((30, 30)) < 0.15
+            np.fill_diagonal(adjacency, False)
+            matrices[question_id] = adjacency
+
+        serial = analyse_matrices(participant_ids, questions, matrices)
+        for result in serial['questions']:
+            # Macierz zapisana jako listy wskazań odtwarza się bez strat
+            self.assertTrue((targets_adjacency(result['matrix'], 30) == matrices[result['question']]).all())
+        self.assertEqual(analyse_matrices(participant_ids, questions, matrices, workers=3), serial)
+        # Pula procesów zostaje na kolejne analizy zamiast startować od nowa
+        pool = process_pool(3)
+        self.assertEqual(analyse_matrices(participant_ids, questions, matrices, workers=3), serial)
+        self.assertIs(process_pool(3), pool)
+
+
+    def test_analyze_research_stores_like_store_analysis(self):
+        user = CustomUser.objects.create_user(email='cli@example.com', username='cli', password='cli')
+        research = seed_research(user, random.Random(4), 15, 2, degrees=False)
+        participants = list(research_participants(research))
+        matrices = build_sociomatrices(research, participants, research_questions(research))
+
+        call_command('analyze_research', '--format', 'table', '--workers', '1', stderr=io.StringIO())
+
+        degrees = degree_lookup(research, [p.pk for p in participants], list(matrices))
+        for question_id, adjacency in matrices.items():
+            self.assertEqual(degrees[question_id].tolist(), matrix_degrees(adjacency).tolist())
+        stored = ResearchAnalysis.objects.get(research=research)
+        self.assertEqual(stored.response_count, Response.objects.filter(research=research).count())
+        self.assertEqual(stored.data, json.loads(json.dumps(store_analysis(research))))
+
+
+@override_settings(METRIX_BACKGROUND_ANALYSIS=True)
+class BackgroundAnalysisTests(TestCase):
+    def test_worker_computes_queued_analysis(self):
+        user = CustomUser.objects.create_user(email='jobs@example.com', username='jobs', password='jobs')
+        self.client.force_login(user)
+        research = seed_research(user, random.Random(0), 20, 2)
+        url = reverse('research-detail', kwargs={'research_id': research.pk})
+        status_url = reverse('research-analysis-status', kwargs={'research_id': research.pk})
+
+        response = self.client.get(url)
+        self.assertIn('analysis_job', response.context)
+        self.assertNotIn('matrices', response.context)
+        self.client.get(url)
+        self.assertEqual(AnalysisJob.objects.filter(research=research).count(), 1)
+        self.assertFalse(self.client.get(status_url).json()['ready'])
+
+        api_url = reverse('research-api', kwargs={'research_id': research.pk})
+        queued = self.client.get(api_url)
+        self.assertEqual(queued.status_code, 202)
+
+        call_command('analysis_worker', '--once', stdout=io.StringIO())
+
+        self.assertEqual(self.client.get(status_url).json(), {'status': 'done', 'ready': True, 'error': ''})
+        # ETag odpowiedzi 202 nie może ukryć analizy zapisanej później przez workera
+        self.assertEqual(self.client.get(api_url, HTTP_IF_NONE_MATCH=queued['ETag']).status_code, 200)
+        response = self.client.get(url)
+        self.assertNotIn('analysis_job', response.context)
+        self.assertEqual(len(response.context['matrices']), 2)
+
+    def test_requests_never_run_the_analysis(self):
+        user = CustomUser.objects.create_user(email='queue@example.com', username='queue', password='queue')
+        self.client.force_login(user)
+        research = seed_research(user, random.Random(0), 20, 2)
+        ongoing = seed_research(user, random.Random(1), 10, 1, completed=False)
+        chains_url = reverse('research-chains', kwargs={'research_id': research.pk})
+
+        with mock.patch('metrix.analysis.analyse_matrices', side_effect=AssertionError("analysis in a request")):
+            self.assertIn('analysis_job', self.client.get(chains_url).context)
+            self.assertEqual(self.client.get(reverse('research-api', args=[research.pk])).status_code, 202)
+            response = self.client.get(reverse('research-export', args=[research.pk, 'group', 'csv']))
+            self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
+
+            # Badanie w trakcie testu: bez analizy i bez zadania w kolejce
+            response = self.client.get(reverse('research-detail', kwargs={'research_id': ongoing.pk}))
+            self.assertNotIn('matrices', response.context)
+            self.assertEqual(self.client.get(reverse('research-api', args=[ongoing.pk])).status_code, 200)
+            self.client.get(reverse('research-chains', kwargs={'research_id': ongoing.pk}))
+        self.assertEqual(AnalysisJob.objects.filter(research=research).count(), 1)
+        self.assertFalse(AnalysisJob.objects.filter(research=ongoing).exists())
+
+        call_command('analysis_worker', '--once', stdout=io.StringIO())
+        response = self.client.get(chains_url)
+        self.assertNotIn('analysis_job', response.context)
+        self.assertTrue(response.context['groups'])
+
+
+class ResearchApiTests(TestCase):
+    def test_conditional_requests(self):
+        user = CustomUser.objects.create_user(email='api@example.com', username='api', password='api')
+        self.client.force_login(user)
+        research = seed_research(user, random.Random(0), 12, 2)
+        url = reverse('research-api', kwargs={'research_id': research.pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertFalse(etag.startswith('W/'))
+        data = response.json()
+        participant_ids = [participant['id'] for participant in data['participants']]
+        for question in data['questions']:
+            self.assertEqual(sum(len(row) for row in question['matrix']), 12 * CHOICE_COUNT)
+            self.assertEqual(sorted(map(int, question['status'])), participant_ids)
+            self.assertTrue(all(pk in participant_ids for pair in question['relations']['pairs'] for pk in pair))
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Nowy krok testu zmienia ETag
+        step = reverse('conduct-test', kwargs={'pk': research.pk, 'step': 0})
+        form = self.client.get(step).context['form']
+        self.client.post(step, {name: [field.choices[-1][0]] for name, field in form.fields.items()})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_participant_changes_refresh_validators(self):
+        user = CustomUser.objects.create_user(email='rename@example.com', username='rename', password='rename')
+        self.client.force_login(user)
+        research = seed_research(user, random.Random(0), 6, 1, completed=False)
+        url = reverse('research-api', kwargs={'research_id': research.pk})
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        participant = Participant.objects.filter(research=research).order_by('pk').first()
+        self.client.post(reverse('participant-edit', args=[participant.pk]), {
+            'name': "Renamed", 'age': participant.age, 'gender': participant.gender, 'description': '',
+        })
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['participants'][0]['name'], "Renamed")
+        stored = Research.objects.get(pk=research.pk)
+        self.assertGreater(stored.data_changed_at, research.data_changed_at)
+        # Data testu (updated_at) zostaje – zmieniły się tylko dane
+        self.assertEqual(stored.updated_at, research.updated_at)
+
+        # Edycja pytania z banku zmienia ETag bez zapisu w badaniach, które go używają
+        etag = response['ETag']
+        question = ResearchQuestion.objects.filter(research=research).first().question
+        question.text = "Who else?"
+        with CaptureQueriesContext(connection) as queries:
+            question.save()
+        self.assertEqual(len(queries), 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['questions'][0]['text'], "Who else?")
+
+    def test_stale_step_keeps_completion(self):
+        user = CustomUser.objects.create_user(email='stale@example.com', username='stale', password='stale')
+        research = seed_research(user, random.Random(0), 6, 1, completed=False)
+        stale = Research.objects.get(pk=research.pk)
+        # Ostatni krok kończy test, zanim zapisze się wcześniejszy krok wczytany z is_completed=False
+        Research.objects.filter(pk=research.pk).update(is_completed=True)
+        participant = Participant.objects.filter(research=research).order_by('pk').first()
+        questions = list(research_questions(research))
+        ConductTestView().save_step(stale, participant, questions, [], is_last_step=False)
+
+        stored = Research.objects.get(pk=research.pk)
+        self.assertTrue(stored.is_completed)
+        self.assertGreater(stored.data_changed_at, stale.data_changed_at)
+        self.assertEqual(stored.updated_at, stale.updated_at)
+
+
+class ImporterTests(TestCase):
+    PARTICIPANTS = "name,age,gender,description\nAda,12,female,\nBen,13,male,quiet\nCid,12,other,\nDot,14,female,\n"
+    CHOICES = "source,question,targets\nAda,Who?,Ben;Cid\nBen,Who?,Ada\nCid,Who?,Ada;Ben\nAda,Why?,Dot\n"
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='import@example.com', username='import', password='import')
+
+    def import_errors(self, participants, choices=None, choice_count=2, questions=None):
+        with self.assertRaises(CSVImportError) as raised:
+            import_research(
+                self.user, "Broken", io.StringIO(participants), choices and io.StringIO(choices), choice_count,
+                question_lines=questions,
+            )
+        self.assertFalse(Research.objects.filter(name="Broken").exists())
+        return raised.exception.errors
+
+    def test_import_with_choices(self):
+        Question.objects.create(text="Who?")
+        research = import_research(self.user, "Class", io.StringIO(self.PARTICIPANTS), io.StringIO(self.CHOICES), 2)
+
+        self.assertTrue(research.is_completed)
+        self.assertEqual(research.question_count, 2)
+        self.assertEqual(Question.objects.filter(text="Who?").count(), 1)  # pytanie z banku użyte ponownie
+        self.assertEqual(Response.objects.filter(research=research).count(), 6)
+        self.assertEqual(
+            list(ResearchQuestion.objects.filter(research=research).values_list('question__text', 'choice_count')),
+            [("Who?", 2), ("Why?", 2)],
+        )
+        ada = Participant.objects.get(research=research, name="Ada")
+        self.assertEqual(ParticipantDegree.objects.get(participant=ada, question__text="Who?").in_degree, 2)
+
+    def test_import_with_questions(self):
+        research = import_research(
+            self.user, "Roster", io.StringIO(self.PARTICIPANTS), choice_count=3, question_lines=["Who?", "", "Why?"]
+        )
+        self.assertFalse(research.is_completed)
+        self.assertEqual(research.question_count, 2)
+        self.assertEqual(ResearchQuestion.objects.filter(research=research, choice_count=3).count(), 2)
+
+        # Badanie bez wyborów przeprowadza się w aplikacji – pierwszy krok ma pole dla każdego pytania
+        response = self.client.get(reverse('conduct-test', kwargs={'pk': research.pk, 'step': 0}))
+        self.assertEqual(len(response.context['form'].fields), 2)
+
+    def test_participant_errors(self):
+        errors = self.import_errors(
+            "name,age,gender\nAda,12,female\nAda,²,female\n,x,robot\nBen,99999999999999999999,male\nCid,151,other\n",
+            questions=["Who?"],
+        )
+        self.assertEqual(errors, [
+            "Participants line 3: duplicate name 'Ada'.",
+            "Participants line 3: age must be a whole number from 0 to 150.",
+            "Participants line 4: name must have 1-100 characters.",
+            "Participants line 4: age must be a whole number from 0 to 150.",
+            "Participants line 4: gender must be one of female, male, other.",
+            "Participants line 5: age must be a whole number from 0 to 150.",
+            "Participants line 6: age must be a whole number from 0 to 150.",
+        ])
+        self.assertEqual(self.import_errors("name,gender\nAda,female\n", questions=["Who?"]),
+                         ["Participants file is missing columns: age."])
+        self.assertEqual(
+            self.import_errors(f"name,age,gender\nAda,12,female\n\"{'x' * (csv.field_size_limit() + 1)}\",12,male\n",
+                               questions=["Who?"]),
+            [f"Participants file is not valid CSV: field larger than field limit ({csv.field_size_limit()})."],
+        )
+
+    def test_choice_errors(self):
+        errors = self.import_errors(
+            self.PARTICIPANTS,
+            "source,question,targets\nAda,Who?,Ada;Ben;Cid\nEve,Who?,Ada\nBen,Who?,Cid;Cid\nBen,Who?,Ada\nCid,Who?,Zed\n",
+        )
+        self.assertEqual(errors, [
+            "Choices line 2: 3 choices, at most 2 allowed.",
+            "Choices line 2: 'Ada' cannot choose themselves.",
+            "Choices line 3: unknown participant 'Eve'.",
+            "Choices line 4: a participant is chosen twice.",
+            "Choices line 5: 'Ben' already answered this question.",
+            "Choices line 6: unknown participant 'Zed'.",
+        ])
+        self.assertEqual(self.import_errors(self.PARTICIPANTS, choice_count=4, questions=["Who?"]),
+                         ["Choice count cannot exceed 3 for this roster."])
+
+    def test_question_errors(self):
+        self.assertEqual(self.import_errors(self.PARTICIPANTS), ["Give at least one question or a choices file."])
+        self.assertEqual(self.import_errors(self.PARTICIPANTS, questions=["Who?", "x" * 256, "Who?"]), [
+            "Questions line 2: question must have 1-255 characters.",
+            "Questions line 3: duplicate question 'Who?'.",
+        ])
+        self.assertEqual(self.import_errors(self.PARTICIPANTS, self.CHOICES, questions=["Who?"]),
+                         ["Give either a choices file or questions, not both."])
+
+    def test_import_form_requires_questions_or_choices(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('import-research'), {
+            'name': "Roster", 'choice_count': 2, 'questions': " ",
+            'participants_file': SimpleUploadedFile('participants.csv', self.PARTICIPANTS.encode()),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Give a choices file or at least one question.", response.context['form'].non_field_errors())
+
+        # Uszkodzony CSV (za długie pole) to błąd formularza, nie 500
+        response = self.client.post(reverse('import-research'), {
+            'name': "Roster", 'choice_count': 2, 'questions': "Who?",
+            'participants_file': SimpleUploadedFile(
+                'participants.csv', f"name,age,gender\n\"{'x' * (csv.field_size_limit() + 1)}\",12,female\n".encode()
+            ),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors()[0].startswith("Participants file is not valid CSV"))
+        self.assertFalse(Research.objects.exists())
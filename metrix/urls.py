@@ -20,10 +20,15 @@ urlpatterns = [
     path('questions/<int:pk>/edit/', QuestionUpdateView.as_view(), name='question-edit'),
     path('questions/<int:pk>/delete/', QuestionDeleteView.as_view(), name='question-delete'),
     path('research/add/', ResearchCreateView.as_view(), name='add-research'),
+    path('research/import/', views.ResearchImportView.as_view(), name='import-research'),
     path('research/<int:research_id>/delete/', ResearchDeleteView.as_view(), name='delete-research'),
     path('research/add/participants/', ParticipantAddView.as_view(), name='add-participants'),
     path('research/add/questions/', ResearchQuestionAddView.as_view(), name='add-research-questions'),
     path('research/<int:research_id>/', ResearchDetailView.as_view(), name='research-detail'),
+    path('research/<int:research_id>/api/', views.research_api, name='research-api'),
+    path('research/<int:research_id>/analysis/status/', views.research_analysis_status, name='research-analysis-status'),
+    path('research/<int:research_id>/chains/', views.research_chains, name='research-chains'),
+    path('research/<int:research_id>/export/<str:dataset>.<str:fmt>', views.research_export, name='research-export'),
     path('research/confirm/', ResearchConfirmView.as_view(), name='research-confirm'),
     path('research/cancel/', cancel_research_creation, name='cancel-research'),
     path('research/<int:pk>/test/', test_redirect),
@@ -1,8 +1,11 @@
-from collections import defaultdict
-from itertools import combinations
+import hashlib
+import io
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
 from django.contrib.auth import views as auth_views, login, update_session_auth_hash, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -12,14 +15,26 @@ from django.views.generic import CreateView, TemplateView
 from django.views.generic.detail import DetailView
 from django.core.paginator import Paginator
 from django.views import View
+from django.views.decorators.http import condition
 from django.contrib import messages
 from django.forms import formset_factory
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 
 
 
 from .models import *
+from . import export
+from .importer import CSVImportError, import_research
+from .analysis import ANALYSIS_VERSION, BitAdjacency, analysis_stamp, build_sociomatrices, chain_starters, \
+    chosen_targets, degree_lookup, hydrate_relations, invalidate_analysis, iter_chains, lock_research, \
+    research_participants, research_questions, status_scores, stored_adjacency, targets_adjacency, top_stars, \
+    union_matrix, update_degrees
+from .jobs import background_analysis, latest_job, refresh_analysis, research_analysis
 from .forms import ResearchCreateForm, ParticipantForm, ResearchQuestionForm, ConductTestForm, EmailUpdateForm, \
-    PasswordUpdateForm, UsernameUpdateForm
+    PasswordUpdateForm, UsernameUpdateForm, ParticipantFilterForm, ResearchImportForm
 
 from metrix.forms import CustomUserCreationForm, AddQuestionForm
 
@@ -117,12 +132,26 @@ def research(request):
     return render(request, 'metrix/research.html', {'page_obj': page_obj})
 
 
+DRAFT_SESSION_KEY = 'research_draft'
+
+
+def get_research_draft(request):
+    # W sesji trzymamy tylko id szkicu – dane kreatora są w tabelach ResearchDraft
+    draft_id = request.session.get(DRAFT_SESSION_KEY)
+    if draft_id is None:
+        return None
+    return ResearchDraft.objects.filter(pk=draft_id, owner=request.user).first()
+
+
+def clear_research_draft(request):
+    draft_id = request.session.pop(DRAFT_SESSION_KEY, None)
+    if draft_id is not None:
+        ResearchDraft.objects.filter(pk=draft_id, owner=request.user).delete()
+
+
 @login_required
 def cancel_research_creation(request):
-    keys_to_clear = ['research_data', 'participants_data', 'questions_data']
-    for key in keys_to_clear:
-        if key in request.session:
-            del request.session[key]
+    clear_research_draft(request)
     return redirect('research')
 class LogoutView(auth_views.LogoutView):
     next_page = reverse_lazy('index')
@@ -141,15 +170,20 @@ class QuestionListView(LoginRequiredMixin, ListView):
     model = Question
     template_name = 'metrix/question_list.html'
     context_object_name = 'questions'
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-pk']
+    paginate_by = 25
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        search = self.request.GET.get('q', '').strip()
+        if search:
+            queryset = queryset.filter(text__icontains=search)
+        # Czy pytanie jest użyte w badaniu – podzapytanie EXISTS liczone tylko dla pytań z bieżącej strony
+        return queryset.annotate(is_used=Exists(ResearchQuestion.objects.filter(question=OuterRef('pk'))))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        # Pobierz ID pytań używanych w jakimkolwiek ResearchQuestion
-        used_question_ids = ResearchQuestion.objects.values_list('question_id', flat=True).distinct()
-        context['used_question_ids'] = set(used_question_ids)  # set dla szybszego sprawdzania w templatce
-
+        context['search'] = self.request.GET.get('q', '').strip()
         return context
 
 
@@ -177,68 +211,63 @@ class ResearchCreateView(LoginRequiredMixin, FormView):
     template_name = 'metrix/research_create.html'
 
     def get(self, request, *args, **kwargs):
-        # Jeśli zaczynasz nowy proces tworzenia badania, czyść dane sesyjne
-        keys_to_clear = ['research_data', 'participants_data', 'questions_data']
-        for key in keys_to_clear:
-            if key in request.session:
-                del request.session[key]
+        # Jeśli zaczynasz nowy proces tworzenia badania, usuń poprzedni szkic
+        clear_research_draft(request)
         return super().get(request, *args, **kwargs)
 
-    def get_initial(self):
-        return self.request.session.get('research_data', {})
-
     def form_valid(self, form):
-        # Zapisz dane z pierwszego kroku do sesji
-        self.request.session['research_data'] = form.cleaned_data
-        self.request.session.modified = True
+        # Zapisz dane z pierwszego kroku jako nowy szkic
+        clear_research_draft(self.request)
+        draft = ResearchDraft.objects.create(owner=self.request.user, **form.cleaned_data)
+        self.request.session[DRAFT_SESSION_KEY] = draft.pk
         # Przekieruj do dodawania uczestników
         return redirect('add-participants')
 
 class ParticipantAddView(LoginRequiredMixin, View):
     def get(self, request):
-        research_data = request.session.get('research_data')
-        if not research_data:
+        draft = get_research_draft(request)
+        if not draft:
             return redirect('add-research')
 
-        person_count = research_data['person_count']
+        person_count = draft.person_count
 
-        # Pobierz dane z sesji lub stwórz listę pustych dictów o długości person_count
-        initial_data = request.session.get('participants_data')
-        if not initial_data or len(initial_data) != person_count:
+        # Pobierz uczestników ze szkicu lub stwórz listę pustych dictów o długości person_count
+        initial_data = list(draft.participants.values('name', 'age', 'gender', 'description'))
+        if len(initial_data) != person_count:
             initial_data = [{} for _ in range(person_count)]
 
         ParticipantFormSet = formset_factory(ParticipantForm, extra=0)
         formset = ParticipantFormSet(initial=initial_data)
 
-        return render(request, 'metrix/participant_add.html', {'formset': formset, 'research': research_data})
+        return render(request, 'metrix/participant_add.html', {'formset': formset, 'research': draft})
 
     def post(self, request):
-        research_data = request.session.get('research_data')
-        person_count = research_data['person_count']
+        draft = get_research_draft(request)
+        if not draft:
+            return redirect('add-research')
 
         ParticipantFormSet = formset_factory(ParticipantForm, extra=0)
         formset = ParticipantFormSet(request.POST)
 
         if formset.is_valid():
-            participants_data = [form.cleaned_data for form in formset]
-            request.session['participants_data'] = participants_data
-            request.session.modified = True
+            # Zapisujemy tylko zmienione wiersze szkicu
+            draft.sync_rows(DraftParticipant, [form.cleaned_data for form in formset])
             return redirect('add-research-questions')
 
-        return render(request, 'metrix/participant_add.html', {'formset': formset, 'research': research_data})
+        return render(request, 'metrix/participant_add.html', {'formset': formset, 'research': draft})
 
 
 class ResearchQuestionAddView(LoginRequiredMixin, View):
     def get(self, request):
-        research_data = request.session.get('research_data')
-        if not research_data:
+        draft = get_research_draft(request)
+        if not draft:
             return redirect('add-research')
 
-        question_count = research_data['question_count']
-        person_count = research_data['person_count']
-        max_choices = person_count - 1
+        question_count = draft.question_count
+        max_choices = draft.person_count - 1
 
-        initial_data = request.session.get('questions_data', [{}] * question_count)
+        initial_data = list(draft.questions.values('question', 'choice_count'))
+        initial_data += [{}] * (question_count - len(initial_data))
 
         QuestionFormSet = formset_factory(ResearchQuestionForm, extra=0)
         formset = QuestionFormSet(initial=initial_data)
@@ -250,20 +279,19 @@ class ResearchQuestionAddView(LoginRequiredMixin, View):
 
         return render(request, 'metrix/research_questions_add.html', {
             'formset': formset,
-            'research': research_data
+            'research': draft
         })
 
     def post(self, request):
-        research_data = request.session.get('research_data')
-        if not research_data:
+        draft = get_research_draft(request)
+        if not draft:
             return redirect('add-research')
 
-        max_choices = research_data['person_count'] - 1
+        max_choices = draft.person_count - 1
         QuestionFormSet = formset_factory(ResearchQuestionForm, extra=0)
         formset = QuestionFormSet(request.POST)
 
         if formset.is_valid():
-            questions_data = []
             seen_question_ids = set()
 
             for form in formset:
@@ -284,25 +312,19 @@ class ResearchQuestionAddView(LoginRequiredMixin, View):
             if any(form.errors for form in formset):
                 return render(request, 'metrix/research_questions_add.html', {
                     'formset': formset,
-                    'research': research_data
-                })
-
-            # wszystko OK, zapisujemy do sesji
-            for form in formset:
-                question_obj = form.cleaned_data['question']
-                questions_data.append({
-                    'question_id': question_obj.pk,
-                    'question_text': question_obj.text,
-                    'choice_count': form.cleaned_data['choice_count']
+                    'research': draft
                 })
 
-            request.session['questions_data'] = questions_data
-            request.session.modified = True
+            # wszystko OK, zapisujemy do szkicu
+            draft.sync_rows(DraftQuestion, [
+                {'question_id': form.cleaned_data['question'].pk, 'choice_count': form.cleaned_data['choice_count']}
+                for form in formset
+            ])
             return redirect('research-confirm')
 
         return render(request, 'metrix/research_questions_add.html', {
             'formset': formset,
-            'research': research_data
+            'research': draft
         })
 
 
@@ -314,331 +336,307 @@ class ResearchDetailView(LoginRequiredMixin, DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        research = self.get_object()
+        research = self.object
 
-        participants = Participant.objects.filter(research=research)
-        responses = Response.objects.filter(research=research).select_related('source', 'target', 'question')
-        questions = ResearchQuestion.objects.filter(research=research).select_related('question')
+        participants = list(research_participants(research))
+        questions = list(research_questions(research))
+        context['questions'] = questions
+        context['participants'] = participants
+        # Macierz jako tabela HTML albo (matrix=client) jako lista wskazań rysowana w przeglądarce
+        client_matrix = self.request.GET.get('matrix') == 'client'
+        context['client_matrix'] = client_matrix
 
-        matrices = []
-        for rq in questions:
-            matrix = {
-                'rq': rq,
-                'question': rq.question,
-                'data': []
-            }
-
-            for source in participants:
-                row = []
-                for target in participants:
-                    match = responses.filter(question=rq.question, source=source, target=target).exists()
-                    row.append(match)
-                matrix['data'].append({'source': source.name, 'row': row})
-            matrices.append(matrix)
+        # Analiza jest pokazywana dopiero po zakończeniu testu – wcześniej nie liczymy jej wcale
+        if not research.is_completed:
+            return context
 
-        context['questions'] = list(questions)
-        context['participants'] = participants
-        context['matrices'] = matrices
+        # Cała analiza liczona na macierzach w metrix.analysis – tutaj tylko podstawiamy obiekty.
+        # Wynik jest zapisany w ResearchAnalysis; w trybie w tle brakującą analizę liczy worker
+        # (manage.py analysis_worker), a strona pokazuje zaślepkę
+        analysis, job = research_analysis(research, participants, questions)
+        if analysis is None:
+            context['analysis_job'] = job
+            return context
 
-        # OGÓLNE RELACJE (niezależnie od pytania)
-        adjacency = defaultdict(set)
-        for r in responses:
-            adjacency[r.source].add(r.target)
-
-        all_participants = list(participants)
-        pairs, chains, stars, cliques = [], [], [], []
-
-        for a in all_participants:
-            for b in adjacency[a]:
-                if a in adjacency[b] and a.pk < b.pk:
-                    pairs.append((a, b))
-
-        for a in all_participants:
-            for b in adjacency[a]:
-                if a not in adjacency[b]:
-                    for c in adjacency[b]:
-                        if b not in adjacency[c] and c != a:
-                            chains.append((a, b, c))
-
-        threshold = len(participants) // 2
-        for p in all_participants:
-            incoming = sum(1 for others in adjacency.values() if p in others)
-            outgoing = len(adjacency[p])
-            if incoming >= threshold and outgoing == 0:
-                stars.append(p)
-
-        for combo in combinations(all_participants, 3):
-            a, b, c = combo
-            if (b in adjacency[a] and c in adjacency[a] and
-                    a in adjacency[b] and c in adjacency[b] and
-                    a in adjacency[c] and b in adjacency[c]):
-                cliques.append(combo)
-
-        network = all(all(p2 in adjacency[p1] or p1 == p2 for p2 in all_participants) for p1 in all_participants)
-
-        context['relations'] = {
-            'pairs': pairs,
-            'chains': chains,
-            'stars': stars,
-            'cliques': cliques,
-            'network': network,
-        }
+        context['relations'] = hydrate_relations(analysis['relations'], participants)
 
-        # RELACJE I WSKAŹNIKI PER PYTANIE
+        matrices = []
         relations_by_question = {}
         group_metrics_by_question = {}
         individual_metrics_by_question = {}
 
-        for rq in questions:
+        for rq, result in zip(questions, analysis['questions']):
             question = rq.question
-            q_responses = responses.filter(question=question)
-            adjacency = defaultdict(set)
-            incoming_count = defaultdict(int)
-
-            for r in q_responses:
-                adjacency[r.source].add(r.target)
-                incoming_count[r.target] += 1
-
-            all_participants = list(participants)
-            mutual_count = 0
-            unreciprocated_count = 0
-
-            # Pary
-            pairs = []
-            for a in all_participants:
-                for b in adjacency[a]:
-                    if a in adjacency[b] and a.pk < b.pk:
-                        pairs.append((a, b))
-                        mutual_count += 1
-
-            # Łańcuchy
-            chains = []
-            for a in all_participants:
-                for b in adjacency[a]:
-                    if a not in adjacency[b]:
-                        for c in adjacency[b]:
-                            if b not in adjacency[c] and c != a:
-                                chains.append((a, b, c))
-
-            # Gwiazdy – osoby z największą liczbą wskazań (incoming votes)
-            stars = []
-            incoming_counts = {p: 0 for p in all_participants}
-            for voters in adjacency.values():
-                for voted in voters:
-                    incoming_counts[voted] += 1
-            if incoming_counts:
-                max_incoming = max(incoming_counts.values())
-                stars = [p for p, count in incoming_counts.items() if count == max_incoming and max_incoming > 0]
-
-            # Kliki
-            cliques = []
-            for combo in combinations(all_participants, 3):
-                a, b, c = combo
-                if (b in adjacency[a] and c in adjacency[a] and
-                        a in adjacency[b] and c in adjacency[b] and
-                        a in adjacency[c] and b in adjacency[c]):
-                    cliques.append(combo)
-
-            # Sieć
-            network = all(all(p2 in adjacency[p1] or p1 == p2 for p2 in all_participants) for p1 in all_participants)
-
-            # **Tutaj klucze na question.pk zamiast question**
-            relations_by_question[question.pk] = {
-                'pairs': pairs,
-                'chains': chains,
-                'stars': stars,
-                'cliques': cliques,
-                'network': network,
-            }
-
-            # 🧮 Wskaźniki grupowe
-            required_choices = rq.choice_count or 1  # zabezpieczenie
-            participant_count = len(participants)
-            max_mutual_possible = (required_choices * participant_count) / 2
-            cohesion = mutual_count / max_mutual_possible if max_mutual_possible else 0
-
-            for a in all_participants:
-                for b in adjacency[a]:
-                    if a not in adjacency[b]:
-                        unreciprocated_count += 1
-
-            denominator_density = unreciprocated_count * (
-                    1 - (required_choices / (participant_count - 1))) if participant_count > 1 else 0
-            numerator_density = mutual_count * (
-                    1 - (required_choices / (participant_count - 1))) if participant_count > 1 else 0
-
-            if denominator_density > 0:
-                density = numerator_density / denominator_density
-            elif numerator_density > 0:
-                density = float('inf')  # unreciprocated == 0, mutual > 0
+            matrix = {'rq': rq, 'question': question}
+            if client_matrix:
+                matrix['payload_id'] = f"matrix-{rq.pk}"
+                matrix['targets'] = result['matrix']
             else:
-                density = 0
-
-            non_isolated = sum(1 for p in participants if incoming_count[p] > 0)
-            isolated = participant_count - non_isolated
-            isolation = (1 / isolated) if isolated > 0 else 0
-
-            group_metrics_by_question[question.pk] = {
-                'cohesion': round(cohesion, 2),
-                'density': round(density, 2) if density != float('inf') else '∞',
-                'isolation': round(isolation, 2)
-            }
-
-            individual_status = {}
-            for p in participants:
-                status = incoming_count[p] / (participant_count - 1) if participant_count > 1 else 0
-                individual_status[p] = round(status, 2)
-
-            individual_metrics_by_question[question.pk] = individual_status
+                # Analiza przechowuje wiersze jako listy wskazań – pełną tabelę odtwarzamy tylko do renderowania
+                rows = targets_adjacency(result['matrix'], len(participants)).tolist()
+                matrix['data'] = [{'source': p.name, 'row': row} for p, row in zip(participants, rows)]
+            matrices.append(matrix)
+            relations_by_question[question.pk] = hydrate_relations(result['relations'], participants)
+            group_metrics_by_question[question.pk] = result['group']
+            individual_metrics_by_question[question.pk] = dict(zip(participants, result['individual']))
 
+        context['matrices'] = matrices
+        context['participant_names'] = [p.name for p in participants]
+        # Wyrenderowane macierze i listy struktur trzymamy w cache; klucz zmienia się z każdym przeliczeniem analizy
+        context['analysis_stamp'] = analysis_stamp(research)
+        context['fragment_cache_timeout'] = (
+            getattr(settings, 'METRIX_FRAGMENT_CACHE_TIMEOUT', 3600) if context['analysis_stamp'] else 0
+        )
+        context['export_datasets'] = [
+            ('matrix', 'Sociomatrices'), ('edges', 'Responses'),
+            ('group', 'Group metrics'), ('individual', 'Individual status'),
+        ]
+        context['xlsx_export'] = export.Workbook is not None
         context['relations_by_question'] = relations_by_question
         context['group_metrics_by_question'] = group_metrics_by_question
         context['individual_metrics_by_question'] = individual_metrics_by_question
 
         return context
 
+class ResearchImportView(LoginRequiredMixin, FormView):
+    form_class = ResearchImportForm
+    template_name = 'metrix/research_import.html'
+
+    def form_valid(self, form):
+        choices_file = form.cleaned_data['choices_file']
+        try:
+            research = import_research(
+                owner=self.request.user,
+                name=form.cleaned_data['name'],
+                participant_lines=io.TextIOWrapper(form.cleaned_data['participants_file'], encoding='utf-8-sig'),
+                choice_lines=io.TextIOWrapper(choices_file, encoding='utf-8-sig') if choices_file else None,
+                choice_count=form.cleaned_data['choice_count'],
+                question_lines=None if choices_file else form.cleaned_data['questions'].splitlines(),
+            )
+        except (CSVImportError, UnicodeDecodeError) as error:
+            for message in getattr(error, 'errors', ["Files must be UTF-8 encoded CSV."]):
+                form.add_error(None, message)
+            return self.form_invalid(form)
+
+        messages.success(self.request, f"Imported {research.person_count} participants.")
+        return redirect('research-detail', research_id=research.pk)
+
+
 class ResearchConfirmView(LoginRequiredMixin, TemplateView):
     template_name = 'metrix/research_confirm.html'
 
     def get(self, request):
-        research_data = request.session.get('research_data')
-        participants_data = request.session.get('participants_data')
-        questions_data = request.session.get('questions_data')
+        draft = get_research_draft(request)
+        if not draft:
+            return redirect('research')
 
-        if not (research_data and participants_data and questions_data):
+        participants = list(draft.participants.all())
+        questions = list(draft.questions.select_related('question'))
+        if not (participants and questions):
             return redirect('research')
 
         context = {
-            'research': research_data,
-            'participants': participants_data,
-            'questions': questions_data,
+            'research': draft,
+            'participants': participants,
+            'questions': questions,
         }
         return render(request, self.template_name, context)
 
     def post(self, request):
-        research_data = request.session.get('research_data')
-        participants_data = request.session.get('participants_data')
-        questions_data = request.session.get('questions_data')
+        draft = get_research_draft(request)
+        participants = list(draft.participants.all()) if draft else []
+        questions = list(draft.questions.all()) if draft else []
 
-        if not (research_data and participants_data and questions_data):
+        if not (draft and participants and questions):
             messages.error(request, "Incomplete data to save research.")
             return redirect('research')
 
-        # Tworzymy Research w bazie
-        research = Research.objects.create(
-            owner=request.user,
-            name=research_data['name'],
-            person_count=research_data['person_count'],
-            question_count=research_data['question_count']
-        )
-
-        # Tworzymy uczestników
-        for pdata in participants_data:
-            participant = Participant(
-                research=research,
-                **pdata
-            )
-            participant.save()
+        if len(questions) != draft.question_count:
+            messages.error(request, "Some of the selected questions no longer exist.")
+            return redirect('add-research-questions')
 
-        # Tworzymy pytania
-        for qdata in questions_data:
-            question_instance = Question.objects.get(pk=qdata['question_id'])
-            ResearchQuestion.objects.create(
-                research=research,
-                question=question_instance,
-                choice_count=qdata['choice_count']
+        # Całe badanie zapisujemy w jednej transakcji – bez częściowo utworzonych badań
+        with transaction.atomic():
+            research = Research.objects.create(
+                owner=request.user,
+                name=draft.name,
+                person_count=draft.person_count,
+                question_count=draft.question_count
             )
 
-        for key in ['research_data', 'participants_data', 'questions_data']:
-            if key in request.session:
-                del request.session[key]
+            Participant.objects.bulk_create([
+                Participant(
+                    research=research,
+                    name=participant.name,
+                    age=participant.age,
+                    gender=participant.gender,
+                    description=participant.description
+                )
+                for participant in participants
+            ])
+
+            ResearchQuestion.objects.bulk_create([
+                ResearchQuestion(
+                    research=research,
+                    question_id=question.question_id,
+                    choice_count=question.choice_count
+                )
+                for question in questions
+            ])
+
+            draft.delete()
+            request.session.pop(DRAFT_SESSION_KEY, None)
 
         return redirect('/research/')
 
-def test_redirect(request, pk):
+async def test_redirect(request, pk):
     return redirect('conduct-test', pk=pk, step=0)
-class ConductTestView(View):
-    def get(self, request, pk, step=0):
-        research = get_object_or_404(Research, pk=pk)
-        participants_qs = research.participant_set.all()
-        participants = list(participants_qs)
-
-        if step >= len(participants):
-            return redirect('test-completed', pk=pk)
 
-        current_participant = participants[step]
-        questions = ResearchQuestion.objects.filter(research=research)
-
-
-        form = ConductTestForm(
-            participant=current_participant,
-            questions=questions,
-            choices_queryset=participants_qs
-        )
 
-        return render(request, 'metrix/conduct_test.html', {
+# Widoki wypełniania testu są asynchroniczne: pod ASGI jedno zadanie obsługuje wiele klas naraz,
+# a synchroniczne są tylko zapis kroku (transakcja) i renderowanie szablonu (TemplateResponse)
+class ConductTestView(View):
+    async def resolve_step(self, research, step):
+        # Tylko bieżący uczestnik (stała kolejność po pk) i lekka lista (pk, imię) do pól wyboru
+        current_participant = await research.participant_set.order_by('pk')[step:step + 1].afirst()
+        roster = [row async for row in research.participant_set.order_by('pk').values_list('pk', 'name')]
+        questions = [
+            question async for question in
+            ResearchQuestion.objects.filter(research=research).select_related('question').order_by('pk')
+        ]
+        return current_participant, roster, questions
+
+    def render_step(self, request, form, current_participant, step, roster, research, questions):
+        return TemplateResponse(request, 'metrix/conduct_test.html', {
             'form': form,
             'participant': current_participant,
             'step': step,
-            'total': len(participants),
+            'total': len(roster),
             'research': research,
             'questions': questions,
-            'participants': participants
+            'participants': roster
         })
 
-    def post(self, request, pk, step=0):
-        research = get_object_or_404(Research, pk=pk)
-        participants_qs = research.participant_set.all()
-        participants = list(participants_qs)
+    async def get(self, request, pk, step=0):
+        research = await aget_object_or_404(Research, pk=pk)
+        current_participant, roster, questions = await self.resolve_step(research, step)
 
-        if step >= len(participants):
+        if current_participant is None:
             return redirect('test-completed', pk=pk)
 
-        current_participant = participants[step]
-        questions = ResearchQuestion.objects.filter(research=research)
+        form = ConductTestForm(
+            participant=current_participant,
+            questions=questions,
+            roster=roster
+        )
+        return self.render_step(request, form, current_participant, step, roster, research, questions)
+
+    async def post(self, request, pk, step=0):
+        research = await aget_object_or_404(Research, pk=pk)
+        current_participant, roster, questions = await self.resolve_step(research, step)
+
+        if current_participant is None:
+            return redirect('test-completed', pk=pk)
 
         form = ConductTestForm(
             request.POST,
             participant=current_participant,
             questions=questions,
-            choices_queryset=participants_qs
+            roster=roster
         )
 
         if form.is_valid():
-            for question in questions:
-                selected_targets = form.cleaned_data.get(f"question_{question.id}", [])
-                for target in selected_targets:
-                    Response.objects.create(
-                        research=research,
-                        question=question.question,
-                        source=current_participant,
-                        target=target
-                    )
-
-            # 👇 Dopiero po zapisaniu ostatniego uczestnika ustawiamy is_completed
-            if step + 1 >= len(participants):
-                research.is_completed = True
-                research.save()
-
+            responses = [
+                Response(
+                    research=research,
+                    question_id=question.question_id,
+                    source=current_participant,
+                    target_id=target_id
+                )
+                for question in questions
+                for target_id in form.cleaned_data.get(f"question_{question.id}", [])
+            ]
+            is_last_step = step + 1 >= len(roster)
+            await sync_to_async(self.save_step)(research, current_participant, questions, responses, is_last_step)
             return redirect('conduct-test', pk=pk, step=step + 1)
 
-        return render(request, 'metrix/conduct_test.html', {
-            'form': form,
-            'participant': current_participant,
-            'step': step,
-            'total': len(participants),
-            'research': research,
-            'questions': questions,
-            'participants': participants
-        })
+        return self.render_step(request, form, current_participant, step, roster, research, questions)
+
+    def save_step(self, research, current_participant, questions, responses, is_last_step):
+        # transaction.atomic nie działa w kodzie asynchronicznym, więc zapis kroku jest synchroniczny
+        targets = {question.question_id: set() for question in questions}
+        for response in responses:
+            targets[response.question_id].add(response.target_id)
+
+        # Jedna transakcja na cały krok; ponowne wysłanie kroku zastępuje poprzednie odpowiedzi
+        with transaction.atomic():
+            # Blokada badania szereguje równoległe kroki; stopnie liczymy przyrostowo, zanim stare odpowiedzi znikną
+            lock_research(research)
+            update_degrees(research, current_participant.pk, targets)
+            Response.objects.filter(
+                research=research,
+                source=current_participant,
+                question_id__in=[question.question_id for question in questions]
+            ).delete()
+            Response.objects.bulk_create(responses)
+            invalidate_analysis(research.pk)
+
+            # Zapis kolumn wprost (UPDATE), nie research.save() – obiekt z początku żądania mógłby
+            # nadpisać is_completed=True z równoległego ostatniego kroku
+            changes = {'data_changed_at': timezone.now()}
+            if is_last_step:
+                # 👇 Dopiero po zapisaniu ostatniego uczestnika ustawiamy is_completed (tylko na True)
+                changes.update(is_completed=True, updated_at=changes['data_changed_at'])
+            Research.objects.filter(pk=research.pk).update(**changes)
+
+        if is_last_step:
+            refresh_analysis(research)
 
 
 class TestCompletedView(TemplateView):
     template_name = 'metrix/test_completed.html'
 
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data(**kwargs))
+
+PARTICIPANTS_PER_PAGE = 50
+
+
+@login_required
 def participant_manage_list(request):
-    participants = Participant.objects.all()
-    return render(request, 'metrix/participants_manage.html', {'participants': participants})
+    filter_form = ParticipantFilterForm(request.GET, owner=request.user)
+    participants = filter_form.filter(
+        Participant.objects.filter(research__owner=request.user).select_related('research')
+    )
+
+    # Paginacja po kluczu (pk) zamiast OFFSET – koszt strony nie rośnie wraz z numerem strony
+    after = request.GET.get('after', '')
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        page = list(participants.filter(pk__lt=before).order_by('-pk')[:PARTICIPANTS_PER_PAGE + 1])
+        has_previous = len(page) > PARTICIPANTS_PER_PAGE
+        page = page[:PARTICIPANTS_PER_PAGE][::-1]
+        # Cofnięcie mogło zacząć się za ostatnim wierszem (usunięty uczestnik, zmieniony filtr)
+        has_next = bool(page) and participants.filter(pk__gt=page[-1].pk).exists()
+    else:
+        if after.isdigit():
+            participants = participants.filter(pk__gt=after)
+        page = list(participants.order_by('pk')[:PARTICIPANTS_PER_PAGE + 1])
+        has_next = len(page) > PARTICIPANTS_PER_PAGE
+        page = page[:PARTICIPANTS_PER_PAGE]
+        has_previous = after.isdigit()
+
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+
+    return render(request, 'metrix/participants_manage.html', {
+        'participants': page,
+        'filter_form': filter_form,
+        'filter_query': query.urlencode(),
+        'next_cursor': page[-1].pk if page and has_next else None,
+        'previous_cursor': page[0].pk if page and has_previous else None,
+    })
 
 def participant_edit(request, pk):
     participant = get_object_or_404(Participant, pk=pk)
@@ -652,9 +650,211 @@ def participant_edit(request, pk):
     return render(request, 'metrix/participant_edit.html', {'form': form, 'participant': participant})
 
 def participant_detail(request, pk):
-    participant = get_object_or_404(Participant, pk=pk)
+    participant = get_object_or_404(Participant.objects.select_related('research'), pk=pk)
     researches = [participant.research]
+
+    # Stopnie, status i gwiazdy to odczyty z ParticipantDegree – bez analizy całego badania
+    participant_ids = list(research_participants(participant.research).values_list('pk', flat=True))
+    questions = list(research_questions(participant.research))
+    degrees = degree_lookup(participant.research, participant_ids, [rq.question_id for rq in questions])
+    position = participant_ids.index(participant.pk)
+    question_degrees = []
+    for rq in questions:
+        incoming, outgoing, mutual = degrees[rq.question_id]
+        question_degrees.append({
+            'question': rq.question,
+            'in_degree': int(incoming[position]),
+            'out_degree': int(outgoing[position]),
+            'mutual_count': int(mutual[position]),
+            'status': status_scores(incoming)[position],
+            'is_star': position in top_stars(incoming),
+        })
+
     return render(request, 'metrix/participant_detail.html', {
         'participant': participant,
-        'researches': researches
-    })
\ No newline at end of file
+        'researches': researches,
+        'question_degrees': question_degrees,
+    })
+
+
+@login_required
+def research_analysis_status(request, research_id):
+    research = get_object_or_404(Research, pk=research_id, owner=request.user)
+    job = latest_job(research)
+    return JsonResponse({
+        'status': job.status if job else None,
+        'ready': job is None or job.status == AnalysisJob.DONE,
+        'error': job.error if job else '',
+    })
+
+
+def research_api_state(request, research_id):
+    """
+    (research, ETag, Last-Modified) of the API response, computed once per request; None for a missing research.
+
+    Both validators describe the data before the view runs, so they must not
+    depend on anything the view itself stores (the analysis of a completed
+    research is a function of that data and ANALYSIS_VERSION).
+    """
+    if not hasattr(request, '_research_api_state'):
+        research = Research.objects.filter(pk=research_id, owner=request.user).first()
+        state = None
+        if research is not None:
+            # data_changed_at zmienia się z każdym krokiem testu i zapisem uczestnika lub pytania (metrix.signals),
+            # updated_at z edycją samego badania; liczby wierszy wychwytują usunięcia, a treści – edycje pytań z banku
+            last_modified = max(research.updated_at, research.data_changed_at)
+            version = [
+                ANALYSIS_VERSION, research.pk, research.updated_at.isoformat(), research.data_changed_at.isoformat(),
+                Response.objects.filter(research=research).count(),
+                Participant.objects.filter(research=research).count(),
+                *ResearchQuestion.objects.filter(research=research).order_by('pk').values_list(
+                    'question_id', 'choice_count', 'question__text'
+                ),
+            ]
+            if research.is_completed and background_analysis():
+                # Analizę zapisuje worker, nie to żądanie – walidatory zmieniają się, gdy ją zapisze
+                analysed_at = ResearchAnalysis.objects.filter(research=research).values_list(
+                    'updated_at', flat=True
+                ).first()
+                version.append(analysed_at and analysed_at.isoformat())
+                last_modified = max(last_modified, analysed_at or last_modified)
+            etag = hashlib.sha256(':'.join(map(str, version)).encode()).hexdigest()
+            state = research, etag, last_modified
+        request._research_api_state = state
+    return request._research_api_state
+
+
+def research_api_etag(request, research_id):
+    state = research_api_state(request, research_id)
+    return state and f'"{state[1]}"'
+
+
+def research_api_last_modified(request, research_id):
+    state = research_api_state(request, research_id)
+    return state and state[2]
+
+
+@login_required
+@condition(etag_func=research_api_etag, last_modified_func=research_api_last_modified)
+def research_api(request, research_id):
+    """
+    The research and its analysis as JSON.
+
+    Matrices list the chosen participant positions of every row; structures
+    and statuses use participant ids. The analysis is included once the test
+    is completed (202 while it is queued). Unchanged research answers 304.
+    """
+    state = research_api_state(request, research_id)
+    if state is None:
+        raise Http404("No research found.")
+    research = state[0]
+    participants = list(research_participants(research))
+    questions = list(research_questions(research))
+
+    participant_ids = [p.pk for p in participants]
+    data = {
+        'id': research.pk,
+        'name': research.name,
+        'is_completed': research.is_completed,
+        'updated_at': research.updated_at,
+        'participants': [{'id': p.pk, 'name': p.name} for p in participants],
+        'questions': [
+            {'id': rq.question_id, 'text': rq.question.text, 'choice_count': rq.choice_count} for rq in questions
+        ],
+    }
+
+    if not research.is_completed:
+        # W trakcie testu – same macierze, analiza powstaje po jego zakończeniu (jak na stronie badania)
+        matrices = build_sociomatrices(research, participants, questions)
+        for question, rq in zip(data['questions'], questions):
+            question['matrix'] = chosen_targets(matrices[rq.question_id])
+        return JsonResponse(data)
+
+    analysis, job = research_analysis(research, participants, questions)
+    if analysis is None:
+        return JsonResponse({'status': job.status}, status=202)
+
+    data['relations'] = hydrate_relations(analysis['relations'], participant_ids)
+    for question, result in zip(data['questions'], analysis['questions']):
+        question.update({
+            'matrix': result['matrix'],
+            'relations': hydrate_relations(result['relations'], participant_ids),
+            'group': result['group'],
+            'status': dict(zip(participant_ids, result['individual'])),
+        })
+    return JsonResponse(data)
+
+
+CHAIN_STARTERS_PER_PAGE = 20
+
+
+@login_required
+def research_chains(request, research_id):
+    research = get_object_or_404(Research, pk=research_id, owner=request.user)
+    participants = list(research_participants(research))
+    questions = list(research_questions(research))
+    # Jedno pytanie albo (bez parametru) suma wszystkich pytań
+    question = next((rq.question for rq in questions if str(rq.question_id) == request.GET.get('question')), None)
+
+    if research.is_completed:
+        analysis, job = research_analysis(research, participants, questions)
+        if analysis is None:
+            return render(request, 'metrix/research_chains.html', {
+                'research': research, 'question': question, 'questions': questions, 'analysis_job': job,
+            })
+        adjacency = stored_adjacency(analysis, question.pk if question else None)
+    else:
+        # Do łańcuchów wystarczą macierze – bez pełnej analizy badania w trakcie testu
+        matrices = build_sociomatrices(research, participants, questions)
+        adjacency = union_matrix(
+            (matrix for question_id, matrix in matrices.items() if question is None or question_id == question.pk),
+            len(participants),
+        )
+    bitsets = BitAdjacency(adjacency)
+
+    # Strony dzielą uczestników rozpoczynających łańcuchy; łańcuchy liczymy tylko dla bieżącej strony
+    page = Paginator(chain_starters(bitsets), CHAIN_STARTERS_PER_PAGE).get_page(request.GET.get('page'))
+    counts = dict(page.object_list)
+    groups = {a: [] for a in counts}
+    for a, b, c in iter_chains(bitsets, starters=counts):
+        groups[a].append((participants[b], participants[c]))
+
+    return render(request, 'metrix/research_chains.html', {
+        'research': research,
+        'question': question,
+        'questions': questions,
+        'page_obj': page,
+        'groups': [
+            {'starter': participants[a], 'count': counts[a], 'chains': chains} for a, chains in groups.items()
+        ],
+    })
+
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+@login_required
+def research_export(request, research_id, dataset, fmt):
+    research = get_object_or_404(Research, pk=research_id, owner=request.user)
+    if dataset not in export.DATASETS or fmt not in EXPORT_CONTENT_TYPES:
+        raise Http404("Unknown export.")
+    if fmt == 'xlsx' and export.Workbook is None:
+        raise Http404("XLSX export requires openpyxl.")
+
+    header, rows = export.DATASETS[dataset](research)
+    filename = f"research-{research.pk}-{dataset}.{fmt}"
+
+    if fmt == 'xlsx':
+        return FileResponse(
+            export.write_xlsx(header, rows, title=dataset),
+            as_attachment=True, filename=filename, content_type=EXPORT_CONTENT_TYPES[fmt]
+        )
+
+    stream = export.stream_csv(header, rows) if fmt == 'csv' else export.stream_jsonl(header, rows)
+    response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response